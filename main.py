@@ -1,5 +1,6 @@
 import sys
 import os
+import logging
 
 # Add src to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -7,5 +8,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from src.ui.main_window import App
 
 if __name__ == "__main__":
+    # LOG_LEVEL=DEBUG shows the services' debug output (e.g. LLM request details)
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format="%(levelname)s: %(name)s: %(message)s")
     app = App()
     app.mainloop()
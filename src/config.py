@@ -1,30 +1,81 @@
 import os
-from dotenv import load_dotenv
+import atexit
+import functools
+import threading
+import orjson
+from dotenv import load_dotenv, dotenv_values
 
 load_dotenv()
 
+@functools.lru_cache(maxsize=1)
+def _read_settings_file(path, mtime):
+    """Parse the settings file. Cached per (path, mtime) so unchanged files are read once."""
+    with open(path, 'rb') as f:
+        return orjson.loads(f.read())
+
 class Config:
     PEXELS_API_KEY = os.getenv("PEXELS_API_KEY")
     POLLINATIONS_API_KEY = os.getenv("POLLINATIONS_API_KEY")
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
     GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+    # Optional extra Pollinations keys; scene planning round-robins across all keys
+    POLLINATIONS_EXTRA_API_KEYS = [k.strip() for k in os.getenv("POLLINATIONS_EXTRA_API_KEYS", "").split(",") if k.strip()]
+    LLM_API_URL = os.getenv("LLM_API_URL", "https://gen.pollinations.ai/v1/chat/completions")
+    # Seconds a key is skipped after it gets rate limited (429) without a Retry-After header
+    LLM_KEY_COOLDOWN = 60
     # POLLINATIONS_MODEL = "zimage"
     POLLINATIONS_MODEL = os.getenv("POLLINATIONS_MODEL", "zimage")
     IMAGE_ANIMATION_ENABLED = os.getenv("IMAGE_ANIMATION_ENABLED", "True").lower() == "true"
     WHISPER_MODEL_SIZE = "medium"
+    # Local WhisperX batch size; 0 picks one from free VRAM (CUDA) or a small CPU default
+    WHISPER_BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", "0"))
+    # CTranslate2 compute type override (e.g. "float16"); empty picks one for the device
+    WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "")
     OUTPUT_DIR = os.path.join(os.getcwd(), "output")
+    LLM_CACHE_DIR = os.path.join(OUTPUT_DIR, ".llm_cache")
+    LLM_CACHE_TTL = 86400  # seconds
+    # Generated Pollinations images, content-addressed by prompt/size/model; least recently used are evicted above the cap
+    IMAGE_CACHE_DIR = os.path.join(OUTPUT_DIR, ".image_cache")
+    IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_MB", "1024")) * 1024 * 1024
+    # Downloaded scene media (Pexels/DDG), keyed by URL hash; least recently used files are evicted above the cap
+    MEDIA_CACHE_DIR = os.path.join(OUTPUT_DIR, ".media_cache")
+    MEDIA_CACHE_MAX_BYTES = int(os.getenv("MEDIA_CACHE_MAX_MB", "2048")) * 1024 * 1024
+    # Decoded 16 kHz waveforms for local transcription, keyed by source path/mtime/size
+    AUDIO_CACHE_DIR = os.path.join(OUTPUT_DIR, ".audio_cache")
+    AUDIO_CACHE_MAX_BYTES = int(os.getenv("AUDIO_CACHE_MAX_MB", "1024")) * 1024 * 1024
+    # Max relative narration-length difference for reusing a plan of a near-identical script
+    LLM_NEAR_DUPLICATE_TOLERANCE = 0.02
     POLLINATIONS_MODELS_FILE = os.path.join(os.getcwd(), "pollinations_models.json")
+    # Scenes whose media is searched/downloaded in parallel
+    MEDIA_FETCH_WORKERS = 8
+    # Scene clips built in parallel by the MoviePy renderer
+    SCENE_BUILD_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+    # Final export encoder: "auto" probes NVENC/QSV, "h264_nvenc"/"h264_qsv" force one, anything else uses libx264
+    VIDEO_ENCODER = os.getenv("VIDEO_ENCODER", "auto")
+    # "ffmpeg" composes the final video in one ffmpeg filter graph (MoviePy on failure); "moviepy" always uses MoviePy
+    VIDEO_RENDERER = os.getenv("VIDEO_RENDERER", "ffmpeg")
     
     # Default enabled sources
     ENABLED_MEDIA_SOURCES = os.getenv("ENABLED_MEDIA_SOURCES", "pexels,pollinations").split(",")
 
+    # .env file and a snapshot of the values persisted in it
+    ENV_FILE = os.path.join(os.getcwd(), ".env")
+    _env_snapshot = dict(dotenv_values(ENV_FILE)) if os.path.exists(ENV_FILE) else {}
+    _env_lock = threading.Lock()
+
     # User Settings File
     USER_SETTINGS_FILE = os.path.join(os.getcwd(), "user_settings.json")
+    # Delay before pending settings are written, so bursts of UI changes coalesce into one write
+    SETTINGS_SAVE_DELAY = 0.5
+    _pending_settings = None
+    _save_timer = None
+    _save_lock = threading.Lock()
 
     @staticmethod
     def load_user_settings():
         """Load user settings from JSON file. Returns default dict if file missing."""
-        import json
+        # Make sure a pending debounced save is on disk before reading
+        Config.flush_user_settings()
         default_settings = {
             "aspect_ratio": "16:9",
             "input_mode": "script",
@@ -36,15 +87,15 @@ class Config:
         
         if os.path.exists(Config.USER_SETTINGS_FILE):
             try:
-                with open(Config.USER_SETTINGS_FILE, 'r') as f:
-                    saved_settings = json.load(f)
-                    # Update defaults with saved values (preserves new keys if defaults expand)
-                    default_settings.update(saved_settings)
-                    
-                    # Update Config static property if present
-                    if "enabled_media_sources" in saved_settings:
-                         Config.ENABLED_MEDIA_SOURCES = saved_settings["enabled_media_sources"]
-                         
+                mtime = os.path.getmtime(Config.USER_SETTINGS_FILE)
+                saved_settings = _read_settings_file(Config.USER_SETTINGS_FILE, mtime)
+                # Update defaults with saved values (preserves new keys if defaults expand)
+                default_settings.update(saved_settings)
+                
+                # Update Config static property if present
+                if "enabled_media_sources" in saved_settings:
+                     Config.ENABLED_MEDIA_SOURCES = list(saved_settings["enabled_media_sources"])
+                     
             except Exception as e:
                 print(f"Error loading user settings: {e}")
                 
@@ -52,13 +103,37 @@ class Config:
 
     @staticmethod
     def save_user_settings(settings):
-        """Save user settings dict to JSON file."""
-        import json
-        try:
-            with open(Config.USER_SETTINGS_FILE, 'w') as f:
-                json.dump(settings, f, indent=4)
-        except Exception as e:
-            print(f"Error saving user settings: {e}")
+        """
+        Schedule settings dict to be saved to JSON file.
+        Saves are debounced: only the latest snapshot is written once no new
+        save arrives for SETTINGS_SAVE_DELAY seconds (and always at exit).
+        """
+        with Config._save_lock:
+            Config._pending_settings = dict(settings)
+            if Config._save_timer:
+                Config._save_timer.cancel()
+            Config._save_timer = threading.Timer(Config.SETTINGS_SAVE_DELAY, Config.flush_user_settings)
+            Config._save_timer.daemon = True
+            Config._save_timer.start()
+
+    @staticmethod
+    def flush_user_settings():
+        """Write any pending settings to disk immediately (atomic replace)."""
+        with Config._save_lock:
+            settings = Config._pending_settings
+            Config._pending_settings = None
+            if Config._save_timer:
+                Config._save_timer.cancel()
+                Config._save_timer = None
+            if settings is None:
+                return
+            try:
+                tmp_path = Config.USER_SETTINGS_FILE + ".tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(orjson.dumps(settings))
+                os.replace(tmp_path, Config.USER_SETTINGS_FILE)
+            except Exception as e:
+                print(f"Error saving user settings: {e}")
 
     @staticmethod
     def validate():
@@ -68,8 +143,15 @@ class Config:
     @staticmethod
     def save_key(key, value):
         from dotenv import set_key
-        env_file = os.path.join(os.getcwd(), ".env")
         # Update memory
         setattr(Config, key, value)
-        # Update file
-        set_key(env_file, key, value)
+        # Update file only if the persisted value actually changes (set_key re-parses and rewrites .env).
+        # set_key rewrites via a temp file; the lock serializes concurrent saves so none are lost.
+        with Config._env_lock:
+            if Config._env_snapshot.get(key) == value:
+                return
+            set_key(Config.ENV_FILE, key, value)
+            Config._env_snapshot[key] = value
+
+# Ensure debounced settings are not lost on shutdown
+atexit.register(Config.flush_user_settings)
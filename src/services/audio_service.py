@@ -1,13 +1,46 @@
-import requests
 import os
+import re
 import time
-import urllib.parse
-import json
+import orjson
 import base64
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import subprocess
-from pydub import AudioSegment
+import shutil
+import wave
+import functools
 from ..config import Config
+from ..utils.http_utils import POST_SESSION, RETRY_STATUS_CODES, backoff_delay
+
+_AUDIO_SIGNATURES = (b'ID3', b'\xFF\xFB', b'RIFF', b'OggS', b'fLaC')
+_ERROR_INDICATOR_RE = re.compile(rb'<html|<!DOCTYPE|error|\{"error"|not found|unauthorized', re.IGNORECASE)
+
+def _silence_mp3(sample_rate, channels):
+    """
+    Returns the path of a 500ms silent MP3 matching the given format.
+    The file is generated once per format under Config.AUDIO_CACHE_DIR and reused afterwards.
+    """
+    os.makedirs(Config.AUDIO_CACHE_DIR, exist_ok=True)
+    path = os.path.join(Config.AUDIO_CACHE_DIR, f"silence_500ms_{sample_rate}_{channels}.mp3")
+    if not os.path.exists(path):
+        layout = "mono" if channels == 1 else "stereo"
+        tmp_path = path + ".tmp.mp3"
+        subprocess.run([
+            'ffmpeg', '-y',
+            '-f', 'lavfi',
+            '-i', f'anullsrc=r={sample_rate}:cl={layout}',
+            '-t', '0.5',
+            '-acodec', 'libmp3lame',
+            tmp_path
+        ], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        os.replace(tmp_path, path)
+    return path
+
+@functools.lru_cache(maxsize=1)
+def _silence_segment():
+    """500ms of silence for the pydub fallback, built once (segments are immutable)."""
+    from pydub import AudioSegment
+    return AudioSegment.silent(duration=500)
 
 class TTSService(ABC):
     @abstractmethod
@@ -15,6 +48,28 @@ class TTSService(ABC):
         pass
 
 class PollinationsTTS(TTSService):
+    API_URL = "https://gen.pollinations.ai/v1/chat/completions"
+
+    def __init__(self):
+        # Invariant parts of the request, built once per instance
+        self._payload_template = {
+            "model": "openai-audio",
+            "modalities": ["text", "audio"]
+        }
+        self._headers = None
+        self._headers_key = None
+
+    def _get_headers(self):
+        """Headers are rebuilt only when the API key changes (it can be updated from the UI)."""
+        api_key = Config.POLLINATIONS_API_KEY
+        if self._headers is None or api_key != self._headers_key:
+            headers = {"Content-Type": "application/json"}
+            if api_key:
+                headers["Authorization"] = f"Bearer {api_key}"
+            self._headers = headers
+            self._headers_key = api_key
+        return self._headers
+
     def generate_audio(self, text: str, output_path: str, voice: str = "alloy"):
         """
         Generates audio using Pollinations.ai API with chunking support for long scripts.
@@ -27,26 +82,42 @@ class PollinationsTTS(TTSService):
         if not chunks:
             raise ValueError("Script is empty or could not be split.")
             
-        chunk_files = []
+        chunk_files = [None] * len(chunks)
         temp_dir = os.path.dirname(output_path)
         base_name = os.path.splitext(os.path.basename(output_path))[0]
         
         try:
-            # 2. Generate audio for each chunk
-            for i, chunk in enumerate(chunks):
-                chunk_id = i + 1
-                chunk_filename = os.path.join(temp_dir, f"{base_name}_chunk_{chunk_id:03d}.mp3")
-                
-                print(f"Processing chunk {chunk_id}/{len(chunks)}...")
-                if self._generate_single_chunk(chunk, chunk_filename, voice):
-                    chunk_files.append(chunk_filename)
-                else:
-                    raise Exception(f"Failed to generate audio for chunk {chunk_id}")
-                
-                # Small delay to be nice to the API
-                time.sleep(1)
+            # 2. Two-stage pipeline: network requests on io_pool, base64 decode + disk
+            # write on decode_pool, so finished chunks are written while others download
+            with ThreadPoolExecutor(max_workers=min(8, len(chunks))) as io_pool, \
+                 ThreadPoolExecutor(max_workers=min(len(chunks), os.cpu_count() or 1)) as decode_pool:
+                try:
+                    fetches = {}
+                    for i, chunk in enumerate(chunks):
+                        print(f"Processing chunk {i + 1}/{len(chunks)}...")
+                        fetches[io_pool.submit(self._fetch_chunk_audio, chunk, voice)] = i
+
+                    writes = {}
+                    for future in as_completed(fetches):
+                        i = fetches[future]
+                        audio_content = future.result()
+                        if not audio_content:
+                            raise Exception(f"Failed to generate audio for chunk {i + 1}")
+                        chunk_filename = os.path.join(temp_dir, f"{base_name}_chunk_{i + 1:03d}.mp3")
+                        # Track the file even if the write fails so it gets cleaned up
+                        chunk_files[i] = chunk_filename
+                        writes[decode_pool.submit(self._write_base64_to_file, audio_content, chunk_filename)] = i
+
+                    for future in as_completed(writes):
+                        i = writes[future]
+                        print(f"  ✓ Chunk {i + 1} saved: {chunk_files[i]} ({future.result()} bytes)")
+                except BaseException:
+                    # Don't wait for queued (paid) requests once a chunk has failed
+                    io_pool.shutdown(wait=False, cancel_futures=True)
+                    decode_pool.shutdown(wait=False, cancel_futures=True)
+                    raise
 
-            # 3. Combine chunks
+            # 3. Combine chunks (in original order)
             if self._combine_audio_files(chunk_files, output_path):
                 print(f"Audio successfully generated at {output_path}")
                 return output_path
@@ -56,7 +127,7 @@ class PollinationsTTS(TTSService):
         finally:
             # Cleanup temp files
             for f in chunk_files:
-                if os.path.exists(f):
+                if f and os.path.exists(f):
                     try:
                         os.remove(f)
                     except:
@@ -64,31 +135,32 @@ class PollinationsTTS(TTSService):
 
     def _split_script_into_chunks(self, script, max_chunk_length=300):
         chunks = []
-        lines = script.strip().split('\n')
-        current_chunk = ""
+        lines = [line.strip() for line in script.strip().splitlines()]
+        # Accumulate lines per chunk and join once on flush (avoids quadratic +=)
+        current_parts = []
+        current_len = 0  # length of "\n".join(current_parts)
         
         for line in lines:
-            line = line.strip()
             if not line:
                 continue
                 
             # If direction like [calm tone], start new chunk
             if line.startswith('[') and line.endswith(']'):
-                if current_chunk:
-                    chunks.append(current_chunk)
-                current_chunk = line
+                if current_parts:
+                    chunks.append("\n".join(current_parts))
+                current_parts = [line]
+                current_len = len(line)
             # Check length
-            elif len(current_chunk) + len(line) > max_chunk_length and current_chunk:
-                chunks.append(current_chunk)
-                current_chunk = line
+            elif current_parts and current_len + len(line) > max_chunk_length:
+                chunks.append("\n".join(current_parts))
+                current_parts = [line]
+                current_len = len(line)
             else:
-                if current_chunk:
-                    current_chunk += "\n" + line
-                else:
-                    current_chunk = line
+                current_len += len(line) + (1 if current_parts else 0)
+                current_parts.append(line)
         
-        if current_chunk:
-            chunks.append(current_chunk)
+        if current_parts:
+            chunks.append("\n".join(current_parts))
             
         print(f"Split script into {len(chunks)} chunks")
         for i, chunk in enumerate(chunks):
@@ -109,31 +181,16 @@ class PollinationsTTS(TTSService):
             print("  ⚠ Response too small to be valid audio")
             return False
         
-        # Check for common audio file signatures
-        audio_signatures = {
-            b'ID3': 'mp3',  # MP3 with ID3 tag
-            b'\xFF\xFB': 'mp3',  # MP3 without ID3 tag
-            b'RIFF': 'wav',  # WAV files
-            b'OggS': 'ogg',  # OGG files
-            b'fLaC': 'flac', # FLAC files
-        }
-        
-        for signature, file_type in audio_signatures.items():
-            if content.startswith(signature):
-                print(f"  ✓ Valid {file_type.upper()} audio signature detected")
-                return True
-        
-        # Check for common error patterns in content
-        error_indicators = [
-            b'<html', b'<!DOCTYPE', b'error', b'Error', 
-            b'{"error"', b'not found', b'unauthorized'
-        ]
+        # Check for common audio file signatures (MP3 w/ and w/o ID3, WAV, OGG, FLAC)
+        if content.startswith(_AUDIO_SIGNATURES):
+            print("  ✓ Valid audio signature detected")
+            return True
         
-        content_start = content[:500].lower()  # Check first 500 bytes
-        for indicator in error_indicators:
-            if indicator.lower() in content_start:
-                print(f"  ✗ Error indicator found: {indicator}")
-                return False
+        # Check for common error patterns in the first 500 bytes
+        match = _ERROR_INDICATOR_RE.search(content, 0, 500)
+        if match:
+            print(f"  ✗ Error indicator found: {match.group(0)}")
+            return False
         
         # If we get here and it's a reasonable size, assume it's audio
         if len(content) > 5000:  # If larger than 5KB, likely audio
@@ -143,36 +200,34 @@ class PollinationsTTS(TTSService):
         print("  ⚠ Unable to verify audio format, but saving anyway")
         return True
 
-    def _generate_single_chunk(self, text, output_path, voice, max_retries=3):
-        url = "https://gen.pollinations.ai/v1/chat/completions"
-        
-        headers = {
-            "Content-Type": "application/json"
-        }
-        if Config.POLLINATIONS_API_KEY:
-            headers["Authorization"] = f"Bearer {Config.POLLINATIONS_API_KEY}"
-            
+    def _fetch_chunk_audio(self, text, voice, max_retries=3):
+        """
+        Requests TTS for one chunk and returns the base64 audio string (None on failure).
+        Decoding is left to the caller so it can run off the request thread.
+        """
+        headers = self._get_headers()
         payload = {
-            "model": "openai-audio",
+            **self._payload_template,
             "messages": [{"role": "user", "content": text}],
-            "modalities": ["text", "audio"],
             "audio": {"voice": voice, "format": "mp3"}
         }
             
         for attempt in range(max_retries):
             try:
                 print(f"  Attempt {attempt + 1}/{max_retries}")
-                response = requests.post(url, headers=headers, json=payload, timeout=60)
+                # The POST session never re-sends; transient errors (429/5xx) are retried here
+                response = POST_SESSION.post(self.API_URL, headers=headers, json=payload, timeout=60)
                 
+                if response.status_code in RETRY_STATUS_CODES and attempt < max_retries - 1:
+                    print(f"  ✗ API Error ({response.status_code}), retrying")
+                    time.sleep(backoff_delay(attempt))
+                    continue
+
                 if response.status_code != 200:
                     print(f"  ✗ API Error ({response.status_code}): {response.text[:200]}")
-                    if attempt < max_retries - 1:
-                        time.sleep(2)
-                        continue
-                    else:
-                        return False
+                    return None
                 
-                data = response.json()
+                data = orjson.loads(response.content)
                 
                 # Extract audio data
                 audio_content = None
@@ -187,29 +242,114 @@ class PollinationsTTS(TTSService):
                 if not audio_content:
                     print(f"  ✗ No audio data found in response")
                     if attempt < max_retries - 1:
-                        time.sleep(2)
+                        time.sleep(backoff_delay(attempt))
                         continue
                     else:
-                        return False
+                        return None
 
-                # Decode base64
-                audio_bytes = base64.b64decode(audio_content)
-                
-                with open(output_path, 'wb') as f:
-                    f.write(audio_bytes)
-                    
-                print(f"  ✓ Chunk successfully saved: {output_path} ({len(audio_bytes)} bytes)")
-                return True
+                return audio_content
                 
             except Exception as e:
                 print(f"  ✗ Error generating chunk (attempt {attempt+1}): {e}")
                 if attempt < max_retries - 1:
-                    time.sleep(2)
+                    time.sleep(backoff_delay(attempt))
                 else:
-                    return False
-        return False
+                    return None
+        return None
+
+    def _write_base64_to_file(self, b64_data, output_path, slice_size=4 * 16384):
+        """
+        Decode base64 data to disk in slices so the full decoded audio never sits
+        in memory alongside the encoded string. Whitespace (e.g. line-wrapped
+        payloads) is dropped and any characters past the last 4-character group
+        are carried into the next slice, so every decode stays on a base64 boundary.
+        Returns the number of bytes written.
+        """
+        written = 0
+        carry = ""
+        with open(output_path, 'wb') as f:
+            for start in range(0, len(b64_data), slice_size):
+                data = carry + "".join(b64_data[start:start + slice_size].split())
+                cut = len(data) - len(data) % 4
+                carry = data[cut:]
+                if cut:
+                    written += f.write(base64.b64decode(data[:cut]))
+            if carry:
+                # Unpadded tail; b64decode raises on a truncated payload
+                written += f.write(base64.b64decode(carry + "=" * (-len(carry) % 4)))
+        return written
 
     def _combine_audio_files(self, chunk_files, output_path):
+        """
+        Concatenates chunk MP3s (with a 500ms pause after each) into output_path.
+        Uses the ffmpeg concat demuxer (stream copy, no re-encode) when ffmpeg is
+        available, falling back to pydub otherwise.
+        """
+        if shutil.which("ffmpeg") and shutil.which("ffprobe"):
+            try:
+                return self._combine_with_ffmpeg(chunk_files, output_path)
+            except Exception as e:
+                print(f"  ✗ ffmpeg concat failed ({e}), falling back to pydub...")
+        return self._combine_with_pydub(chunk_files, output_path)
+
+    def _probe_audio_format(self, audio_path):
+        """Returns (sample_rate, channels) of the first audio stream using ffprobe."""
+        command = [
+            'ffprobe', '-v', 'error',
+            '-select_streams', 'a:0',
+            '-show_entries', 'stream=sample_rate,channels',
+            '-of', 'json',
+            audio_path
+        ]
+        result = subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stream = orjson.loads(result.stdout)['streams'][0]
+        return int(stream['sample_rate']), int(stream['channels'])
+
+    def _combine_with_ffmpeg(self, chunk_files, output_path):
+        valid_files = [f for f in chunk_files if os.path.exists(f)]
+        if not valid_files:
+            print("  ✗ No valid audio files to combine!")
+            return False
+
+        temp_dir = os.path.dirname(output_path)
+        base_name = os.path.splitext(os.path.basename(output_path))[0]
+        list_path = os.path.join(temp_dir, f"{base_name}_concat.txt")
+
+        try:
+            # Silence must match the chunks' format for stream copy to work
+            sample_rate, channels = self._probe_audio_format(valid_files[0])
+            silence_path = _silence_mp3(sample_rate, channels)
+
+            def _entry(path):
+                escaped = os.path.abspath(path).replace("'", "'\\''")
+                return f"file '{escaped}'\n"
+
+            with open(list_path, 'w', encoding='utf-8') as f:
+                for chunk in valid_files:
+                    f.write(_entry(chunk))
+                    f.write(_entry(silence_path))
+
+            subprocess.run([
+                'ffmpeg', '-y',
+                '-f', 'concat',
+                '-safe', '0',
+                '-i', list_path,
+                '-c', 'copy',
+                output_path
+            ], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+            print(f"  ✓ Combined {len(valid_files)} chunks into {output_path}")
+            return True
+        finally:
+            if os.path.exists(list_path):
+                try:
+                    os.remove(list_path)
+                except:
+                    pass
+
+    def _combine_with_pydub(self, chunk_files, output_path):
+        from pydub import AudioSegment
+
         try:
             combined = AudioSegment.empty()
             valid_count = 0
@@ -219,7 +359,7 @@ class PollinationsTTS(TTSService):
                         segment = AudioSegment.from_mp3(f)
                         combined += segment
                         # Add small pause? Reference adds 500ms
-                        combined += AudioSegment.silent(duration=500)
+                        combined += _silence_segment()
                         valid_count += 1
                         print(f"  ✓ Added {os.path.basename(f)} to combined audio")
                     except Exception as e:
@@ -239,30 +379,62 @@ class PollinationsTTS(TTSService):
             return False
 
 class AudioExtractor:
+    @staticmethod
+    def _probe_audio_codec(video_path: str):
+        """Returns the codec name of the first audio stream (e.g. 'mp3', 'aac'), or None."""
+        try:
+            command = [
+                'ffprobe', '-v', 'error',
+                '-select_streams', 'a:0',
+                '-show_entries', 'stream=codec_name',
+                '-of', 'json',
+                video_path
+            ]
+            result = subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            streams = orjson.loads(result.stdout).get('streams', [])
+            return streams[0].get('codec_name') if streams else None
+        except (OSError, subprocess.CalledProcessError, ValueError):
+            return None
+
     @staticmethod
     def extract_audio(video_path: str, output_path: str):
         """
         Extracts audio from a video file using ffmpeg.
+        MP3 audio tracks are stream-copied; anything else is encoded with
+        multithreaded VBR libmp3lame.
         """
         try:
-            command = [
-                'ffmpeg', '-y',
-                '-i', video_path,
-                '-vn', # No video
-                '-acodec', 'mp3',
-                '-ab', '192k',
-                '-ar', '44100',
-                output_path
-            ]
+            if AudioExtractor._probe_audio_codec(video_path) == 'mp3':
+                command = [
+                    'ffmpeg', '-y',
+                    '-i', video_path,
+                    '-vn', # No video
+                    '-c:a', 'copy',
+                    output_path
+                ]
+            else:
+                command = [
+                    'ffmpeg', '-y',
+                    '-threads', '0',
+                    '-filter_threads', '0',
+                    '-i', video_path,
+                    '-vn', # No video
+                    '-c:a', 'libmp3lame',
+                    '-q:a', '4',
+                    '-ar', '44100',
+                    output_path
+                ]
             subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
             return output_path
         except subprocess.CalledProcessError as e:
             print(f"Error extracting audio: {e}")
             raise
 
-import wave
-from google import genai
-from google.genai import types
+@functools.lru_cache(maxsize=4)
+def _gemini_client(api_key):
+    """Returns a shared genai.Client per API key (google.genai is imported lazily, it is heavy)."""
+    from google import genai
+    return genai.Client(api_key=api_key)
 
 class GeminiTTS(TTSService):
     def __init__(self, api_key=None, model="gemini-2.5-flash-preview-tts"):
@@ -278,7 +450,7 @@ class GeminiTTS(TTSService):
         if not self.api_key:
             raise ValueError("Gemini API key is required. Set GEMINI_API_KEY in .env file.")
         
-        self.client = genai.Client(api_key=self.api_key)
+        self.client = _gemini_client(self.api_key)
     
     def _save_wave_file(self, filename, pcm, channels=1, rate=24000, sample_width=2):
         """Helper to save PCM data as WAV file."""
@@ -297,6 +469,8 @@ class GeminiTTS(TTSService):
             output_path: Path to save the generated audio
             voice: Voice name (Puck, Charon, Kore, Fenrir, Aoede)
         """
+        from google.genai import types
+
         try:
             print(f"Generating audio using Gemini TTS Preview ({self.model_name})...")
             print(f"Voice: {voice}")
@@ -0,0 +1,129 @@
+import os
+import re
+import logging
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import orjson
+
+logger = logging.getLogger(__name__)
+
+_NON_WORD_RE = re.compile(r"[\W_]+")
+
+def normalize_script(text: str) -> str:
+    """Lowercases and collapses punctuation/whitespace so trivially different scripts compare equal."""
+    return _NON_WORD_RE.sub(" ", text.lower()).strip()
+
+class LLMCache:
+    """
+    Exact-match cache for LLM responses.
+    Entries are JSON files (one per key) on disk with a small in-memory LRU in front.
+    Each entry stores its expiry time so stale plans are ignored after `ttl` seconds.
+    """
+
+    def __init__(self, cache_dir: str, memory_size: int = 32, default_ttl: float = 86400):
+        self.cache_dir = cache_dir
+        self.memory_size = memory_size
+        self.default_ttl = default_ttl
+        self.stats = {"hits": 0, "misses": 0}
+        # key -> (expires_at, serialized value)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(**parts) -> str:
+        """SHA-256 over the canonical (sorted-keys) JSON encoding of the given parts."""
+        blob = orjson.dumps(parts, option=orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+        return hashlib.sha256(blob).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def get(self, key: str):
+        """Returns a fresh copy of the cached value, or None on miss/expiry."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, data = entry
+                if expires_at is None or expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return orjson.loads(data)
+                del self._memory[key]
+
+        try:
+            with open(self._path(key), 'rb') as f:
+                envelope = orjson.loads(f.read())
+            expires_at = envelope.get("expires_at")
+            if expires_at is not None and expires_at <= now:
+                raise LookupError("expired")
+            value = envelope["value"]
+        except (OSError, LookupError, orjson.JSONDecodeError):
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+
+        with self._lock:
+            self.stats["hits"] += 1
+        self._remember(key, expires_at, orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY))
+        return value
+
+    def set(self, key: str, value, ttl: float = None):
+        """Stores value (JSON-serializable) under key; ttl=None uses default_ttl, 0 means no expiry."""
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else None
+        self._remember(key, expires_at, orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY))
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._path(key)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(orjson.dumps({"expires_at": expires_at, "value": value}, option=orjson.OPT_SERIALIZE_NUMPY))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Could not write LLM cache: %s", e)
+
+    def _remember(self, key: str, expires_at, data: bytes):
+        with self._lock:
+            self._memory[key] = (expires_at, data)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+
+class NearDuplicateLLMCache:
+    """
+    Second-level cache for scripts that differ from a cached one only by case,
+    whitespace or punctuation. A hit is only accepted when the narration length
+    is within `duration_tolerance` (fraction) of the cached one; scene timings
+    are then rescaled to the new duration.
+    Stored in the given LLMCache under a separate key namespace.
+    """
+
+    def __init__(self, cache: LLMCache, duration_tolerance: float = 0.02):
+        self.cache = cache
+        self.duration_tolerance = duration_tolerance
+
+    def _key(self, script_text: str, **parts) -> str:
+        return LLMCache.make_key(kind="normalized", script=normalize_script(script_text), **parts)
+
+    def get(self, script_text: str, duration: float, **parts):
+        entry = self.cache.get(self._key(script_text, **parts))
+        if not entry or not duration or not entry.get("duration"):
+            return None
+
+        scale = duration / entry["duration"]
+        if abs(scale - 1) > self.duration_tolerance:
+            return None
+
+        result = entry["result"]
+        for scene in result.get("scenes", []):
+            scene["start_time"] = round(scene["start_time"] * scale, 2)
+            scene["end_time"] = round(scene["end_time"] * scale, 2)
+        return result
+
+    def set(self, script_text: str, duration: float, result: dict, **parts):
+        self.cache.set(self._key(script_text, **parts), {"duration": duration, "result": result})
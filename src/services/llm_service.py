@@ -1,193 +1,513 @@
-import json
+import re
+import logging
+import time
+import bisect
+import itertools
+import operator
+import functools
+import threading
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import orjson
 import requests
 import urllib.parse
 from ..config import Config
+from ..utils.http_utils import POST_SESSION, RETRY_STATUS_CODES, MAX_RETRY_AFTER, backoff_delay
+from .llm_cache import LLMCache, NearDuplicateLLMCache
+from ..utils.async_utils import SingleFlight
 import random
+
+logger = logging.getLogger(__name__)
+
+# First ```json ... ``` (or bare ```) block in a model reply
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+
+def _looks_complete(text: str) -> bool:
+    """Cheap check that a JSON body was not cut off: it must end with a closing bracket."""
+    text = text.rstrip()
+    return text.endswith("}") or text.endswith("]")
+
+def _loads_model_json(content: str):
+    """
+    Parses a model reply as JSON. The reply is tried as-is first (the common case
+    with JSON mode on); the markdown fence is only searched for if that fails.
+    """
+    try:
+        return orjson.loads(content)
+    except orjson.JSONDecodeError:
+        fence = _FENCE_RE.search(content)
+        if not fence:
+            raise
+        return orjson.loads(fence.group(1).strip())
+
+# Opening of the "scenes" array in a (possibly partial) JSON reply
+_SCENES_ARRAY_RE = re.compile(r'"scenes"\s*:\s*\[')
+
+class _SceneStreamParser:
+    """
+    Incrementally pulls complete scene objects out of the "scenes" array of a
+    streamed JSON reply, so callers can act on scene 1 while scene 2 is still
+    being generated. Tracks string/escape state so braces inside text are ignored.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = -1  # Scan position; -1 until the array opening is seen
+        self._depth = 0
+        self._obj_start = 0
+        self._in_string = False
+        self._escape = False
+        self._done = False
+
+    def feed(self, text: str) -> list:
+        """Appends a chunk of content and returns scenes completed by it."""
+        self.buffer += text
+        scenes = []
+        if self._done:
+            return scenes
+        if self._pos < 0:
+            match = _SCENES_ARRAY_RE.search(self.buffer)
+            if not match:
+                return scenes
+            self._pos = match.end()
+
+        buf = self.buffer
+        for i in range(self._pos, len(buf)):
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                if self._depth == 0:
+                    self._obj_start = i
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        scenes.append(orjson.loads(buf[self._obj_start:i + 1]))
+                    except orjson.JSONDecodeError:
+                        pass
+            elif ch == "]" and self._depth == 0:
+                self._done = True
+                break
+        self._pos = len(buf)
+        return scenes
+
+# Bump when the prompt changes in a way that should invalidate cached responses
+PROMPT_VERSION = 4
+
+@functools.lru_cache(maxsize=8)
+def _sources_prompt(enabled: frozenset) -> str:
+    """Per-source visual_query rules for the enabled media sources."""
+    available_sources_prompt = ""
+
+    if "pexels" in enabled:
+        available_sources_prompt += """
+- If media_source is "pexels":
+- visual_query MUST be a short, concrete stock search query
+- No artistic or cinematic language
+"""
+
+    if "duckduckgo" in enabled:
+        available_sources_prompt += """
+- If media_source is "duckduckgo":
+- visual_query MUST be a factual real-world search query
+- Used for landmarks, people, events, places
+"""
+
+    if "pollinations" in enabled:
+        available_sources_prompt += """
+- If media_source is "pollinations":
+- visual_query MUST be a detailed AI image generation prompt
+- Describe environment, mood, lighting, camera angle, style
+- Cinematic and context-aware
+"""
+    return available_sources_prompt
+
+@functools.lru_cache(maxsize=8)
+def _build_system_prompt(enabled: tuple) -> str:
+    """
+    Static scene-planning instructions. Depends only on the enabled media sources,
+    so it is built once per source set and is byte-identical across requests.
+    Callers pass the sources sorted, so the setting's order does not matter.
+    """
+    # Dynamic source prompt based on enabled sources
+    available_sources_prompt = _sources_prompt(frozenset(enabled))
+
+    return f"""You are a professional video editor and director. Your goal is to turn a narration script into a perfectly timed video plan.
+The user message contains the INPUT DATA: the narration script and its word-level timings as a JSON array of [word, start_seconds, end_seconds].
+
+### YOUR TASK
+Generate a JSON response containing a list of video scenes.
+Each scene must cover a specific segment of the script.
+
+### SCENE TIMING
+Scenes follow the script in order, back to back, using the word timings for `start_time`/`end_time`.
+Aim for **3 to 7 seconds** per scene (never more than 10), varied with the flow of the speech.
+
+### MEDIA SOURCE RULES
+Select `media_source` ONLY from: {orjson.dumps(list(enabled)).decode()}
+{available_sources_prompt}
+### OUTPUT FORMAT
+Return strictly valid JSON with a single key "scenes".
+Example:
+{{
+"scenes": [
+    {{
+    "id": 1,
+    "text": "The quick brown fox",
+    "start_time": 0.0,
+    "end_time": 3.5,
+    "media_source": "source_name",
+    "visual_query": "red fox running in autumn forest close up"
+    }},
+    {{
+    "id": 2,
+    "text": "The quick brown fox",
+    "start_time": 3.5,
+    "end_time": 7.0,
+    "media_source": "source_name",
+    "visual_query": "red fox running in autumn forest close up"
+    }}
+]
+}}
+"""
+
 class LLMService:
-    def __init__(self, provider="pollinations"):
+    MODEL = "kimi"
+    # Max concurrent scene-planning requests issued through the async API
+    MAX_CONCURRENT_REQUESTS = 8
+    # Minimum POST attempts on 429/5xx (at least one per configured API key)
+    MAX_POST_ATTEMPTS = 3
+    # Identical in-flight planning requests (same cache key) across all instances
+    _inflight = SingleFlight()
+
+    def __init__(self, provider="pollinations", session=None):
         self.provider = provider
+        # Keep-alive pooled session (shared module-wide unless one is injected); no transport-level
+        # POST retries, so rate limits reach the key rotation below and paid calls are never re-sent
+        self.session = session or POST_SESSION
+        self.cache = LLMCache(Config.LLM_CACHE_DIR, default_ttl=Config.LLM_CACHE_TTL)
+        self.near_cache = NearDuplicateLLMCache(self.cache, Config.LLM_NEAR_DUPLICATE_TOLERANCE)
+        # Round-robin state over (url, api_key) endpoints, with per-key rate-limit cooldowns
+        self._rr_index = 0
+        self._cooldown_until = {}
+        self._endpoint_lock = threading.Lock()
+        # Bounded pool backing the async API (its size caps concurrent requests)
+        self._executor = ThreadPoolExecutor(max_workers=self.MAX_CONCURRENT_REQUESTS, thread_name_prefix="llm")
 
-    def segment_script_and_generate_queries(self, script_text: str, word_subtitles: list):
-        """
-        Analyzes the script and word-level subtitles to generate scene segmentation
-        and visual queries using Pollinations.ai.
+    def _endpoints(self) -> list:
+        """All configured (url, api_key) pairs. Read per call since keys can change from the UI."""
+        endpoints = [(Config.LLM_API_URL, Config.POLLINATIONS_API_KEY)]
+        for key in Config.POLLINATIONS_EXTRA_API_KEYS:
+            if key != Config.POLLINATIONS_API_KEY:
+                endpoints.append((Config.LLM_API_URL, key))
+        return endpoints
+
+    def _next_endpoint(self):
+        """Picks the next endpoint round-robin, skipping keys that are cooling down after a 429."""
+        endpoints = self._endpoints()
+        now = time.time()
+        with self._endpoint_lock:
+            for _ in range(len(endpoints)):
+                endpoint = endpoints[self._rr_index % len(endpoints)]
+                self._rr_index += 1
+                if self._cooldown_until.get(endpoint[1], 0) <= now:
+                    return endpoint
+            # Everything is rate limited: use the key that frees up first
+            return min(endpoints, key=lambda ep: self._cooldown_until.get(ep[1], 0))
+
+    def _mark_rate_limited(self, endpoint, response):
+        try:
+            cooldown = float(response.headers.get("Retry-After", Config.LLM_KEY_COOLDOWN))
+        except ValueError:
+            cooldown = Config.LLM_KEY_COOLDOWN
+        with self._endpoint_lock:
+            self._cooldown_until[endpoint[1]] = time.time() + cooldown
+
+    def _post(self, payload: dict, timeout, stream: bool = False):
         """
-        
-        # Dynamic source prompt based on enabled sources
-        available_sources_prompt = ""
-        enabled = Config.ENABLED_MEDIA_SOURCES
-        
-        if "pexels" in enabled:
-            available_sources_prompt += """
-        - If media_source is "pexels":
-        - visual_query MUST be a short, concrete stock search query
-        - No artistic or cinematic language
+        POSTs payload to the chat endpoint. A 429 puts that key on cooldown and retries
+        on the next one; 5xx responses are retried with jittered backoff. Returns the
+        last response.
         """
+        attempts = max(self.MAX_POST_ATTEMPTS, len(self._endpoints()))
+        for attempt in range(attempts):
+            # OpenAI-compatible chat endpoint, rotating across configured API keys
+            url, api_key = self._next_endpoint()
+            headers = {
+                "Content-Type": "application/json"
+            }
+            if api_key:
+                headers["Authorization"] = f"Bearer {api_key}"
 
-        if "duckduckgo" in enabled:
-            available_sources_prompt += """
-        - If media_source is "duckduckgo":
-        - visual_query MUST be a factual real-world search query
-        - Used for landmarks, people, events, places
-        """
+            logger.debug("Sending POST request to %s", url)
+            response = self.session.post(url, headers=headers, json=payload, timeout=timeout, stream=stream)
+            logger.debug("Response status: %s", response.status_code)
+            if response.status_code not in RETRY_STATUS_CODES or attempt == attempts - 1:
+                return response
 
-        if "pollinations" in enabled:
-            available_sources_prompt += """
-        - If media_source is "pollinations":
-        - visual_query MUST be a detailed AI image generation prompt
-        - Describe environment, mood, lighting, camera angle, style
-        - Cinematic and context-aware
+            response.close()
+            if response.status_code == 429:
+                self._mark_rate_limited((url, api_key), response)
+                # Wait only if every key is cooling down
+                with self._endpoint_lock:
+                    free_at = min(self._cooldown_until.get(ep[1], 0) for ep in self._endpoints())
+                delay = min(max(0.0, free_at - time.time()), MAX_RETRY_AFTER)
+            else:
+                delay = backoff_delay(attempt)
+            logger.warning("LLM request got %s; retrying in %.1fs", response.status_code, delay)
+            time.sleep(delay)
+
+    async def segment_script_and_generate_queries_async(self, script_text: str, word_subtitles: list, use_cache: bool = True):
+        """
+        Awaitable version of segment_script_and_generate_queries.
+        The blocking request runs on a bounded worker pool so the event loop stays free
+        to overlap other API calls.
         """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            lambda: self.segment_script_and_generate_queries(script_text, word_subtitles, use_cache)
+        )
 
+    async def segment_scripts_async(self, jobs: list, use_cache: bool = True) -> list:
+        """
+        Plans several scripts concurrently (at most MAX_CONCURRENT_REQUESTS in flight).
+        jobs: list of (script_text, word_subtitles) tuples. Returns results in job order.
+        """
+        return await asyncio.gather(*(
+            self.segment_script_and_generate_queries_async(script_text, word_subtitles, use_cache)
+            for script_text, word_subtitles in jobs
+        ))
 
-        
+    def segment_scripts_batch(self, jobs: list, use_cache: bool = True) -> dict:
+        """
+        Plans a queue of scripts in one call for non-async callers.
+        jobs: list of (script_text, word_subtitles) tuples.
+        Returns {job_index: result}, where result has the same shape as
+        segment_script_and_generate_queries (failed jobs get {"scenes": []}).
+        """
+        if not jobs:
+            return {}
+        results = asyncio.run(self.segment_scripts_async(jobs, use_cache))
+        return dict(enumerate(results))
 
-        # Combine instructions and data into a single robust prompt
+    def _build_messages(self, script_text: str, words_json: str, enabled: list, seed: int = None) -> list:
+        """
+        Chat messages for one scene-planning request (words_json: pre-serialized timings).
+        A seed line is only added when given, so identical requests stay identical.
+        """
+        # Static instructions go in the system message (identical across calls, so the
+        # provider can reuse its prompt-prefix cache); per-request data goes last.
+        system_prompt = _build_system_prompt(tuple(sorted(enabled)))
         #add a random seed in prompt for entropy
-        random_seed = random.randint(0, 1000000)
-        combined_prompt = f"""
-        You are a professional video editor and director. Your goal is to turn a narration script into a perfectly timed video plan.
-        random_seed: {random_seed}
-
-        ### INPUT DATA
-        1. **Script**:
-        {script_text}
-
-        2. **Word-Level Timings** (JSON):
-        {json.dumps(word_subtitles)}
-
-        ### YOUR TASK
-        Generate a JSON response containing a list of video scenes.
-        Each scene must cover a specific segment of the script.
-
-        ### CRITICAL TIMING RULES (MUST FOLLOW)
-        1. **NO GAPS**: The `start_time` of Scene N must EXACTLY match the `end_time` of Scene N-1.
-        2. **FULL COVERAGE**: The first scene starts at the first word's start time. The last scene ends at the last word's end time.
-        3. **DURATION LIMIT**: 
-        - Ideal scene length: **3 to 7 seconds**.
-        - Maximum scene length: **10 seconds** (Absolute Limit).
-        - If a legitimate sentence/segment is longer than 10 seconds, **YOU MUST SPLIT IT** into two visual scenes.
-        4. **PACING**: Vary scene lengths. Don't make them all exactly 5 seconds. Use the flow of the speech.
-
-        ### MEDIA SOURCE RULES
-        Select `media_source` ONLY from: {json.dumps(enabled)}
-        {available_sources_prompt}
-
-        ### OUTPUT FORMAT
-        Return strictly valid JSON with a single key "scenes".
-        Example:
-        {{
-        "scenes": [
-            {{
-            "id": 1,
-            "text": "The quick brown fox",
-            "start_time": 0.0,
-            "end_time": 3.5,
-            "media_source": "source_name",
-            "visual_query": "red fox running in autumn forest close up"
-            }}
-            {{
-            "id": 2,
-            "text": "The quick brown fox",
-            "start_time": 3.5,
-            "end_time": 7.0,
-            "media_source": "source_name",
-            "visual_query": "red fox running in autumn forest close up"
-            }}
-        ]
-        }}
+        seed_line = f"random_seed: {seed}\n\n" if seed is not None else ""
+        user_prompt = f"""{seed_line}### INPUT DATA
+1. **Script**:
+{script_text}
+
+2. **Word-Level Timings** (JSON array of [word, start, end], seconds):
+{words_json}
 """
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    @staticmethod
+    def _notify_scene(on_scene, scene):
+        """Calls on_scene(scene); a failing callback is logged and never aborts the plan."""
+        try:
+            on_scene(scene)
+        except Exception as e:
+            logger.warning("on_scene callback failed: %s", e)
+
+    def _read_stream(self, response, on_scene) -> str:
+        """
+        Consumes an SSE chat-completion stream, calling on_scene(scene) for each
+        scene object as soon as it is complete. Returns the full content text.
+        """
+        parser = _SceneStreamParser()
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            try:
+                chunk = orjson.loads(data)
+            except orjson.JSONDecodeError:
+                continue
+            choices = chunk.get("choices") or []
+            delta = (choices[0].get("delta") or {}).get("content") if choices else None
+            if not delta:
+                continue
+            for scene in parser.feed(delta):
+                self._notify_scene(on_scene, scene)
+        return parser.buffer
+
+    def segment_script_and_generate_queries(self, script_text: str, word_subtitles: list, use_cache: bool = True, *, model: str = None, on_scene=None):
+        """
+        Analyzes the script and word-level subtitles to generate scene segmentation
+        and visual queries using Pollinations.ai.
+        Successful results are cached by script/timings/sources; pass use_cache=False
+        to force a fresh plan. `model` overrides the class default MODEL.
+        If `on_scene` is given, the reply is streamed and on_scene(scene) is called for
+        each raw scene as it arrives (e.g. to start media prefetch early); the returned,
+        validated plan is still authoritative.
+        """
+        model = model or self.MODEL
+        enabled = Config.ENABLED_MEDIA_SOURCES
+        if isinstance(enabled, str):
+            # A comma-joined value (as persisted to .env) must not be iterated per character
+            enabled = [s.strip() for s in enabled.split(",") if s.strip()]
+
+        enabled_key = sorted(enabled)
+        # Serialized once; reused for the cache key and embedded verbatim in the prompt
+        words_json = orjson.dumps(word_subtitles, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+        cache_key = LLMCache.make_key(
+            script=script_text,
+            words=words_json,
+            enabled=enabled_key,
+            model=model,
+            prompt_version=PROMPT_VERSION
+        )
+        # Narration length (end of the last word), used to validate near-duplicate hits
+        duration = float(word_subtitles[-1][2]) if word_subtitles else 0.0
+        near_parts = {"enabled": enabled_key, "model": model, "prompt_version": PROMPT_VERSION}
+        if use_cache:
+            cached = self.cache.get(cache_key)
+            if cached is None:
+                cached = self.near_cache.get(script_text, duration, **near_parts)
+            if cached is not None:
+                logger.debug("LLM cache hit (%d scenes, stats=%s)", len(cached.get('scenes', [])), self.cache.stats)
+                if on_scene is not None:
+                    for scene in cached.get("scenes", []):
+                        self._notify_scene(on_scene, scene)
+                return cached
+
+        # The seed only buys variety on forced refreshes; with caching on it would just
+        # defeat response caching upstream
+        seed = None if use_cache else random.randint(0, 1000000)
+
+        def request_and_cache():
+            result = self._request_plan(script_text, word_subtitles, words_json, enabled, model, seed, on_scene)
+            if result["scenes"]:
+                self.cache.set(cache_key, result)
+                self.near_cache.set(script_text, duration, result, **near_parts)
+            return result
+
+        if use_cache and on_scene is None:
+            # Concurrent identical requests share a single POST
+            return self._inflight.do(cache_key, request_and_cache)
+        return request_and_cache()
+
+    def _request_plan(self, script_text: str, word_subtitles: list, words_json: str, enabled: list, model: str, seed: int = None, on_scene=None) -> dict:
+        """Sends one scene-planning request and returns the validated plan ({"scenes": []} on failure)."""
+        messages = self._build_messages(script_text, words_json, enabled, seed)
 
         try:
-            headers = {
-                "Content-Type": "application/json"
-            }
-            if Config.POLLINATIONS_API_KEY:
-                headers["Authorization"] = f"Bearer {Config.POLLINATIONS_API_KEY}"
-            
-            # Use Unified API with OpenAI-compatible Chat Endpoint
-            url = "https://gen.pollinations.ai/v1/chat/completions"
-            
             payload = {
-                "model": "kimi", # Using 'deepseek' as requested or default reliable model
-                "messages": [
-                    {"role": "user", "content": combined_prompt}
-                ],
-                "json": True  # Pollinations specific parameter for JSON mode
+                "model": model,
+                "messages": messages,
+                "json": True,  # Pollinations specific parameter for JSON mode
+                "response_format": {"type": "json_object"}  # OpenAI-compatible JSON mode
             }
+            if on_scene is not None:
+                payload["stream"] = True
             
-            print(f"DEBUG: Sending POST request to {url}")
-            # print(f"DEBUG: Payload model: {payload['model']}")
-            
-            response = requests.post(url, headers=headers, json=payload)
+            response = self._post(payload, timeout=(10, 120), stream=on_scene is not None)
             
-            print(f"DEBUG: Response status: {response.status_code}")
+            # Providers that ignore "stream" answer with a plain JSON body
+            streaming = on_scene is not None and "text/event-stream" in response.headers.get("Content-Type", "")
             
             if response.status_code == 200:
-                result_text = response.text.strip()
-                
-                # The response from chat/completions is usually a JSON object with 'choices'
-                # But Pollinations sometimes returns just the content or specific structure.
-                # Standard OpenAI format: response['choices'][0]['message']['content']
-                # However, with json=true, Pollinations might return the raw JSON object directly in content?
-                # Let's handle both standard OpenAI format and direct JSON return just in case.
+                if streaming:
+                    parsed_result = _loads_model_json(self._read_stream(response, on_scene))
+                else:
+                    # The response from chat/completions is usually a JSON object with 'choices'
+                    # But Pollinations sometimes returns just the content or specific structure.
+                    # Standard OpenAI format: response['choices'][0]['message']['content']
+                    # However, with json=true, Pollinations might return the raw JSON object directly in content?
+                    # Let's handle both standard OpenAI format and direct JSON return just in case.
                 
-                try:
-                    resp_json = response.json()
-                    content = None
+                    try:
+                        # Parsed straight from the body bytes; no intermediate text decode
+                        resp_json = orjson.loads(response.content)
+                        content = None
                     
-                    if "choices" in resp_json and len(resp_json["choices"]) > 0:
-                        content = resp_json["choices"][0]["message"]["content"]
-                    else:
-                        # Maybe it returned the content directly? (unlikely for strict OpenAI compat but possible for Pollinations)
-                        # or response.text was the content?
-                        content = result_text
-
-                    # Now parse the content string as JSON usually
-                    if isinstance(content, str):
-                        # Clean markdown
-                        if "```json" in content:
-                            content = content.split("```json")[1].split("```")[0].strip()
-                        elif "```" in content:
-                            content = content.split("```")[1].split("```")[0].strip()
-                        
-                        parsed_result = json.loads(content)
-                    else:
-                        parsed_result = content # It might be already a dict if Pollinations magic happened
+                        if isinstance(resp_json, dict) and resp_json.get("choices"):
+                            content = resp_json["choices"][0]["message"]["content"]
+                        else:
+                            # Maybe it returned the content directly? (unlikely for strict OpenAI compat but possible for Pollinations)
+                            # It is already parsed, so use it as-is rather than parsing the body twice
+                            content = resp_json
+
+                        # Now parse the content string as JSON usually
+                        if isinstance(content, str):
+                            # Clean markdown only if needed
+                            parsed_result = _loads_model_json(content)
+                        else:
+                            parsed_result = content # It might be already a dict if Pollinations magic happened
                         
-                except json.JSONDecodeError:
-                     # Fallback if response.json() failed (it shouldn't if 200)
-                     # or if content parsing failed
-                     print(f"DEBUG: Raw response text: {result_text[:200]}...")
-                     # Try parsing raw text if it wasn't valid OpenAI json
-                     parsed_result = json.loads(result_text)
+                    except orjson.JSONDecodeError:
+                         # Fallback if response.json() failed (it shouldn't if 200)
+                         # or if content parsing failed
+                         result_text = response.content.decode("utf-8", errors="replace").strip()
+                         logger.debug("Raw response text: %.200s...", result_text)
+                         # A truncated body cannot parse; skip the second full parse attempt
+                         if not _looks_complete(result_text):
+                             logger.error("LLM response looks truncated")
+                             return {"scenes": []}
+                         # Try parsing raw text if it wasn't valid OpenAI json
+                         parsed_result = orjson.loads(result_text)
 
-                
+                    # Nothing was streamed, so report every scene now
+                    if on_scene is not None and isinstance(parsed_result, dict) and isinstance(parsed_result.get("scenes"), list):
+                        for scene in parsed_result["scenes"]:
+                            self._notify_scene(on_scene, scene)
 
                 # Validate structure
                 if "scenes" in parsed_result and isinstance(parsed_result["scenes"], list):
-                    print(f"DEBUG: Successfully parsed {len(parsed_result['scenes'])} scenes")
+                    logger.debug("Successfully parsed %d scenes", len(parsed_result['scenes']))
+                    
+                    # Fill any missing visual queries in one batched request
+                    missing = [
+                        {"id": i, "text": scene.get("text", "")}
+                        for i, scene in enumerate(parsed_result["scenes"])
+                        if isinstance(scene, dict) and scene.get("text") and not scene.get("visual_query")
+                    ]
+                    if missing:
+                        for i, query in self.generate_visual_queries_only(missing, model=model).items():
+                            parsed_result["scenes"][i]["visual_query"] = query
                     
                     # Validate and fix scenes
                     validated_scenes = self._validate_and_fix_scenes(parsed_result["scenes"], word_subtitles)
-                    print(f"DEBUG: Validated scenes count: {len(validated_scenes)}")
+                    logger.debug("Validated scenes count: %d", len(validated_scenes))
                     
                     return {"scenes": validated_scenes}
                 else:
-                    print("DEBUG: Invalid JSON structure in response, checking keys...")
+                    logger.warning("Invalid JSON structure in response, checking keys...")
                     if isinstance(parsed_result, dict):
-                        print(f"DEBUG: Keys found: {list(parsed_result.keys())}")
+                        logger.warning("Keys found: %s", list(parsed_result.keys()))
                     return {"scenes": []}
             else:
-                print(f"ERROR: Request failed with status {response.status_code}")
-                # print(f"ERROR: Response text: {response.text[:500]}")
+                logger.error("Request failed with status %s", response.status_code)
                 return {"scenes": []}
                     
         except requests.exceptions.Timeout:
-            print("ERROR: Request timed out after 60 seconds")
+            logger.error("Request timed out after 120 seconds")
             return {"scenes": []}
         except Exception as e:
-            print(f"ERROR: LLM Error (Pollinations POST): {e}")
+            logger.error("LLM Error (Pollinations POST): %s", e)
             return {"scenes": []}
 
     def _validate_and_fix_scenes(self, scenes: list, word_subtitles: list) -> list:
@@ -198,6 +518,7 @@ class LLMService:
         3. No gaps between scenes (filled with visual-only scenes)
         4. No overlaps between scenes (adjusted)
         5. Text aligned with word-level subtitles
+        6. First/last scene anchored to the first/last word, scenes back-to-back
         
         Args:
             scenes: List of scene dicts from LLM
@@ -227,12 +548,19 @@ class LLMService:
         ]
         
         # --- Prepare word data ---
-        # Sort words by start time
-        sorted_words = sorted(word_subtitles, key=lambda x: x[1])
+        # Sort words by start time (ASR output is normally already in order; only sort if not)
+        word_starts = [w[1] for w in word_subtitles]
+        if all(a <= b for a, b in zip(word_starts, word_starts[1:])):
+            sorted_words = word_subtitles
+        else:
+            sorted_words = sorted(word_subtitles, key=operator.itemgetter(1))
+            word_starts = [w[1] for w in sorted_words]
         
         def get_words_in_range(start_t: float, end_t: float) -> list:
-            """Get words that START within [start_t, end_t)."""
-            return [w for w in sorted_words if start_t <= w[1] < end_t]
+            """Get words that START within [start_t, end_t) (binary search over start times)."""
+            lo = bisect.bisect_left(word_starts, start_t)
+            hi = bisect.bisect_left(word_starts, end_t, lo)
+            return sorted_words[lo:hi]
         
         def get_text_for_range(start_t: float, end_t: float) -> str:
             """Get concatenated text for words in range."""
@@ -262,7 +590,8 @@ class LLMService:
             else:
                 # Scene is too long, MUST split by time
                 current_time = start
-                part = 1
+                # First split chunk starts at the second variation
+                variations = itertools.cycle(SPLIT_VARIATIONS[1:] + SPLIT_VARIATIONS[:1])
                 while current_time < end:
                     chunk_end = min(current_time + FILLER_CHUNK_SIZE, end)
                     
@@ -274,7 +603,7 @@ class LLMService:
                     chunk_text = get_text_for_range(current_time, chunk_end)
                     
                     # Vary the visual query for each split chunk
-                    variation = SPLIT_VARIATIONS[part % len(SPLIT_VARIATIONS)]
+                    variation = next(variations)
                     base_query = scene.get('visual_query', '')
                     varied_query = base_query + variation if base_query else f"Atmospheric scene{variation}"
                     
@@ -287,7 +616,6 @@ class LLMService:
                     })
                     
                     current_time = chunk_end
-                    part += 1
         
         if not split_scenes:
             return []
@@ -342,6 +670,18 @@ class LLMService:
             else:
                 final_scenes.append(curr)
         
+        # --- PASS 2b: Anchor to the narration and make scenes contiguous ---
+        # (first scene starts on the first word, last ends on the last word, no residual gaps)
+        if final_scenes and sorted_words:
+            first_start = round(float(sorted_words[0][1]), 2)
+            if first_start < final_scenes[0]['end_time']:
+                final_scenes[0]['start_time'] = first_start
+            last_end = round(float(max(w[2] for w in sorted_words)), 2)
+            if last_end > final_scenes[-1]['start_time']:
+                final_scenes[-1]['end_time'] = last_end
+            for prev, curr in zip(final_scenes, final_scenes[1:]):
+                curr['start_time'] = prev['end_time']
+        
         # --- PASS 3: Final validation - ensure no scene > MAX_DURATION ---
         # This is a safety net in case any scene slipped through
         validated_scenes = []
@@ -356,14 +696,14 @@ class LLMService:
                 current_time = scene['start_time']
                 end = scene['end_time']
                 
-                part = 0
+                variations = itertools.cycle(SPLIT_VARIATIONS)
                 while current_time < end:
                     chunk_end = min(current_time + FILLER_CHUNK_SIZE, end)
                     
                     chunk_text = get_text_for_range(current_time, chunk_end)
                     
                     # Vary the visual query
-                    variation = SPLIT_VARIATIONS[part % len(SPLIT_VARIATIONS)]
+                    variation = next(variations)
                     base_query = scene.get('visual_query', '')
                     varied_query = base_query + variation if base_query else f"Atmospheric scene{variation}"
                     
@@ -376,7 +716,6 @@ class LLMService:
                     })
                     
                     current_time = chunk_end
-                    part += 1
         
         # --- Assign sequential IDs ---
         for i, scene in enumerate(validated_scenes):
@@ -384,7 +723,42 @@ class LLMService:
         
         return validated_scenes
 
-    def generate_visual_queries_only(self, text_chunk):
-        pass
+    def generate_visual_queries_only(self, items: list, model: str = None) -> dict:
+        """
+        Writes visual queries for several text chunks in a single request.
+        items: list of {"id": ..., "text": ...}. Returns {id: visual_query} for the
+        ids the model answered (empty dict on failure).
+        """
+        if not items:
+            return {}
+        ids = {item["id"] for item in items}
+        prompt = f"""For each item below, write a short, concrete stock footage search query (visual_query) that illustrates its text.
+Return strictly valid JSON: {{"queries": [{{"id": <id>, "visual_query": "<query>"}}, ...]}} with one entry per item.
+
+Items (JSON):
+{orjson.dumps(items).decode()}
+"""
+        try:
+            payload = {
+                "model": model or self.MODEL,
+                "messages": [{"role": "user", "content": prompt}],
+                "json": True,
+                "response_format": {"type": "json_object"}
+            }
+            response = self._post(payload, timeout=(10, 60))
+            if response.status_code != 200:
+                logger.error("Visual query request failed with status %s", response.status_code)
+                return {}
+
+            content = orjson.loads(response.content)["choices"][0]["message"]["content"]
+            queries = _loads_model_json(content).get("queries", [])
+            logger.debug("Generated %d visual queries in one request", len(queries))
+            return {
+                q["id"]: q["visual_query"] for q in queries
+                if isinstance(q, dict) and q.get("id") in ids and q.get("visual_query")
+            }
+        except Exception as e:
+            logger.error("Visual query generation failed: %s", e)
+            return {}
 
 
@@ -1,13 +1,52 @@
-import requests
 import os
-import json
+import orjson
+import hashlib
+import shutil
+import random
+import asyncio
+import functools
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from ..config import Config
+from ..utils.async_utils import SingleFlight
+from ..utils.http_utils import SESSION
+from ..utils.file_utils import link_or_copy, evict_lru
+
+@functools.lru_cache(maxsize=1)
+def _read_model_names(path, mtime):
+    """Model names from the models file. Cached per (path, mtime) so an unchanged file is parsed once."""
+    with open(path, 'rb') as f:
+        return tuple(m['name'] for m in orjson.loads(f.read()))
 
 class MediaService:
-    def __init__(self):
+    # Concurrent identical searches/generations share one network call
+    _inflight = SingleFlight()
+
+    def __init__(self, session=None):
+        # Keep-alive pooled session (shared module-wide unless one is injected)
+        self.session = session or SESSION
         self.pexels_api_key = Config.PEXELS_API_KEY
         self.headers = {"Authorization": self.pexels_api_key} if self.pexels_api_key else {}
         self.pollinations_api_key = Config.POLLINATIONS_API_KEY
+        # Bounded pool backing the async API, so event-loop callers never block on HTTP
+        self._executor = ThreadPoolExecutor(max_workers=Config.MEDIA_FETCH_WORKERS, thread_name_prefix="media")
+
+    async def _run_async(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def search_pexels_async(self, query: str, orientation="landscape", size="medium", type="video"):
+        """Awaitable version of search_pexels."""
+        return await self._run_async(self.search_pexels, query, orientation=orientation, size=size, type=type)
+
+    async def generate_image_pollinations_async(self, prompt: str, output_path: str, width: int = 1920, height: int = 1080, use_cache: bool = True):
+        """Awaitable version of generate_image_pollinations."""
+        return await self._run_async(self.generate_image_pollinations, prompt, output_path, width, height, use_cache)
+
+    async def search_ddg_images_async(self, query: str):
+        """Awaitable version of search_ddg_images."""
+        return await self._run_async(self.search_ddg_images, query)
 
     def search_pexels(self, query: str, orientation="landscape", size="medium", type="video"):
         """
@@ -19,6 +58,12 @@ class MediaService:
             print("Pexels API key missing.")
             return None
 
+        return self._inflight.do(
+            ("pexels", query, orientation, size, type),
+            self._search_pexels, query, orientation, size, type
+        )
+
+    def _search_pexels(self, query: str, orientation: str, size: str, type: str):
         base_url = "https://api.pexels.com/videos/search" if type == "video" else "https://api.pexels.com/v1/search"
         params = {
             "query": query,
@@ -28,9 +73,9 @@ class MediaService:
         }
         
         try:
-            response = requests.get(base_url, headers=self.headers, params=params)
+            response = self.session.get(base_url, headers=self.headers, params=params)
             response.raise_for_status()
-            data = response.json()
+            data = orjson.loads(response.content)
             
             if type == "video":
                 if data.get('videos'):
@@ -47,46 +92,97 @@ class MediaService:
             print(f"Pexels search error: {e}")
             return None
 
-    def generate_image_pollinations(self, prompt: str, output_path: str, width: int = 1920, height: int = 1080):
+    def generate_image_pollinations(self, prompt: str, output_path: str, width: int = 1920, height: int = 1080, use_cache: bool = True):
         """
         Generates an image using Pollinations.ai with specified dimensions.
+        Images are cached on disk by (prompt, width, height, model); a repeated
+        request is linked/copied from the cache without touching the network.
+        use_cache=False always generates a new image (random seed) and replaces the cached one.
         """
         try:
             # Pollinations image URL format: https://gen.pollinations.ai/image/{prompt}?width={width}&height={height}&model={model}
             model = Config.POLLINATIONS_MODEL #or "flux"
-            url = f"https://gen.pollinations.ai/image/{requests.utils.quote(prompt)}?width={width}&height={height}&model={model}"
-            print(f"Generating Pollinations image: {width}x{height} model={model}")
-            
-            headers = {}
-            if self.pollinations_api_key:
-                headers["Authorization"] = f"Bearer {self.pollinations_api_key}"
-            
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            
-            with open(output_path, 'wb') as f:
-                f.write(response.content)
+            cache_key = hashlib.sha256(f"{prompt}|{width}|{height}|{model}".encode("utf-8")).hexdigest()
+            cache_path = os.path.join(Config.IMAGE_CACHE_DIR, cache_key + ".jpg")
+
+            if use_cache and os.path.exists(cache_path):
+                os.utime(cache_path)  # Mark as recently used for eviction
+                print(f"✓ Using cached Pollinations image: {width}x{height} model={model}")
+            else:
+                # Quote the UTF-8 bytes directly; safe="" so a "/" in the prompt cannot break the path
+                encoded_prompt = urllib.parse.quote_from_bytes(prompt.encode("utf-8"), safe="")
+                params = {"width": width, "height": height, "model": model}
+                if not use_cache:
+                    # Same prompt and seed would give back the same picture
+                    params["seed"] = random.randint(0, 2**31 - 1)
+                query = urllib.parse.urlencode(params)
+                url = f"https://gen.pollinations.ai/image/{encoded_prompt}?{query}"
+                print(f"Generating Pollinations image: {width}x{height} model={model}")
+                
+                headers = {}
+                if self.pollinations_api_key:
+                    headers["Authorization"] = f"Bearer {self.pollinations_api_key}"
+                
+                # A concurrent request for the same image downloads once into the cache
+                os.makedirs(Config.IMAGE_CACHE_DIR, exist_ok=True)
+                self._inflight.do(("pollinations", cache_key, use_cache), self._download_to_file, url, headers, cache_path)
+                evict_lru(Config.IMAGE_CACHE_DIR, Config.IMAGE_CACHE_MAX_BYTES, keep=cache_path)
+
+            link_or_copy(cache_path, output_path)
             return output_path
         except Exception as e:
             print(f"Pollinations image error: {e}")
             return None
 
+    def _download_to_file(self, url: str, headers: dict, output_path: str, chunk_size: int = 1 << 20) -> str:
+        # Stream to disk in chunks so the whole image is never held in memory
+        with self.session.get(url, headers=headers, stream=True) as response:
+            response.raise_for_status()
+            
+            # Write to a temp file first so a failed download never leaves a partial file behind
+            tmp_path = output_path + ".tmp"
+            response.raw.decode_content = True
+            with open(tmp_path, 'wb') as f:
+                shutil.copyfileobj(response.raw, f, length=chunk_size)
+        os.replace(tmp_path, output_path)
+        return output_path
+
+    def search_pexels_batch(self, queries: list, orientation="landscape", size="medium", type="video") -> dict:
+        """
+        Runs search_pexels for several queries concurrently (duplicates searched once).
+        Returns {query: url or None}.
+        """
+        futures = {
+            query: self._executor.submit(self.search_pexels, query, orientation, size, type)
+            for query in dict.fromkeys(queries)
+        }
+        return {query: future.result() for query, future in futures.items()}
+
+    def generate_images_batch(self, jobs: list, width: int = 1920, height: int = 1080) -> list:
+        """
+        Generates several Pollinations images concurrently.
+        jobs: list of (prompt, output_path). Returns output paths (None on failure) in job order.
+        """
+        futures = [
+            self._executor.submit(self.generate_image_pollinations, prompt, output_path, width, height)
+            for prompt, output_path in jobs
+        ]
+        return [future.result() for future in futures]
+
     def search_ddg_images(self, query: str):
         """
-        Searches DuckDuckGo for images using LangChain tool.
+        Searches DuckDuckGo for images.
         Returns the URL of the first result.
         """
         try:
-            from langchain_community.tools import DuckDuckGoSearchResults
-            import json
-            
+            from duckduckgo_search import DDGS
+
             print(f"Searching DDG for: {query}")
-            search = DuckDuckGoSearchResults(output_format="json", backend="images")
-            results_json = search.invoke(query)
-            
-            results = json.loads(results_json)
-            
-            if results and len(results) > 0:
+            # Consume the result dicts directly (no JSON string round-trip)
+            with DDGS() as ddgs:
+                results = list(ddgs.images(query, max_results=1))
+
+            if results:
                 # Return the first image URL (thumbnail or image)
                 first_result = results[0]
                 image_url = first_result.get("image") or first_result.get("thumbnail")
@@ -108,16 +204,40 @@ class MediaService:
         Returns the list of models.
         """
         url = "https://gen.pollinations.ai/image/models"
+        validators_path = Config.POLLINATIONS_MODELS_FILE + ".etag"
         try:
             print("Fetching Pollinations models...")
-            response = requests.get(url)
+            # Revalidate against the ETag/Last-Modified of the saved catalog, if any
+            headers = {}
+            if os.path.exists(Config.POLLINATIONS_MODELS_FILE) and os.path.exists(validators_path):
+                try:
+                    with open(validators_path, 'rb') as f:
+                        validators = orjson.loads(f.read())
+                    if validators.get("etag"):
+                        headers["If-None-Match"] = validators["etag"]
+                    if validators.get("last_modified"):
+                        headers["If-Modified-Since"] = validators["last_modified"]
+                except Exception as e:
+                    print(f"Ignoring unreadable models validators: {e}")
+
+            response = self.session.get(url, headers=headers)
+            if response.status_code == 304:
+                mtime = os.path.getmtime(Config.POLLINATIONS_MODELS_FILE)
+                print("Pollinations models unchanged; using saved list.")
+                return list(_read_model_names(Config.POLLINATIONS_MODELS_FILE, mtime))
+
             response.raise_for_status()
-            models_data = response.json()
-            
+            models_data = orjson.loads(response.content)
+
             # Save to file
-            with open(Config.POLLINATIONS_MODELS_FILE, 'w') as f:
-                json.dump(models_data, f, indent=2)
-            
+            with open(Config.POLLINATIONS_MODELS_FILE, 'wb') as f:
+                f.write(orjson.dumps(models_data, option=orjson.OPT_INDENT_2))
+            with open(validators_path, 'wb') as f:
+                f.write(orjson.dumps({
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified")
+                }))
+
             print(f"Saved {len(models_data)} models to {Config.POLLINATIONS_MODELS_FILE}")
             return [m['name'] for m in models_data]
             
@@ -128,16 +248,26 @@ class MediaService:
     def get_pollinations_models(self):
         """
         Returns list of available model names.
-        Reads from cache if available, otherwise fetches.
+        Reads from cache if available (parsed once per file version), otherwise fetches.
         """
         if os.path.exists(Config.POLLINATIONS_MODELS_FILE):
             try:
-                with open(Config.POLLINATIONS_MODELS_FILE, 'r') as f:
-                    models_data = json.load(f)
-                    return [m['name'] for m in models_data]
+                mtime = os.path.getmtime(Config.POLLINATIONS_MODELS_FILE)
+                return list(_read_model_names(Config.POLLINATIONS_MODELS_FILE, mtime))
             except Exception as e:
                 print(f"Error reading models file: {e}")
         
         # Fallback: fetch fresh
         return self.fetch_pollinations_models()
 
+
+_instance = None
+_instance_lock = threading.Lock()
+
+def get_media_service() -> MediaService:
+    """Process-wide MediaService, so its worker pool and in-flight state are shared."""
+    global _instance
+    with _instance_lock:
+        if _instance is None:
+            _instance = MediaService()
+        return _instance
@@ -1,17 +1,148 @@
 import os
-import json
-import torch
-import requests
-import whisperx
+import hashlib
+import asyncio
+import threading
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from ..config import Config
+from ..utils.http_utils import POST_SESSION
+from ..utils.file_utils import evict_lru
 
-from ..utils.subtitle_utils import segments_to_srt
+from ..utils.subtitle_utils import write_srt
+
+# whisperx pulls in torch, faster-whisper, pyannote, ...; they are imported on the
+# first local transcription so app startup (and Groq-only runs) never pay for them
+torch = None
+whisperx = None
+
+def _lazy_imports():
+    global torch, whisperx
+    if whisperx is None:
+        import torch as _torch
+        import whisperx as _whisperx
+        torch, whisperx = _torch, _whisperx
+
+def _write_json(path: str, data):
+    """Writes JSON via a temp file + os.replace, so readers never see a partial file."""
+    # Indented for readability; numpy scalars from WhisperX serialize natively
+    payload = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+def _write_srt(path: str, segments: list):
+    """Writes the SRT via a temp file + os.replace."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8', buffering=1 << 16) as f:
+        write_srt(segments, f)
+    os.replace(tmp_path, path)
 
 class SubtitleService:
     def __init__(self, model_size="base", device=None):
         self.model_size = Config.WHISPER_MODEL_SIZE or model_size
-        self.device = device if device else ("cuda" if torch.cuda.is_available() else "cpu")
-        self.compute_type = "float16" if self.device == "cuda" else "int8"
+        # Device/compute type are resolved (with the heavy imports) on first local use
+        self.device = device
+        self.compute_type = Config.WHISPER_COMPUTE_TYPE or None
+        self._backend_ready = False
+        # Loaded on first local transcription and kept for later calls
+        self._asr_model = None
+        self._align_cache = {}  # language code -> (align model, metadata)
+        self._model_lock = threading.Lock()
+
+    def _init_backend(self):
+        """Imports torch/whisperx and picks device, compute type and CUDA math settings, once."""
+        with self._model_lock:
+            if self._backend_ready:
+                return
+            _lazy_imports()
+            if not self.device:
+                self.device = "cuda" if torch.cuda.is_available() else "cpu"
+            if not self.compute_type:
+                self.compute_type = self._default_compute_type()
+            if self.device == "cuda":
+                # Alignment is compute-bound: allow TF32 tensor-core matmuls/convs and let
+                # cuDNN pick the fastest conv algorithm once per input shape
+                torch.backends.cuda.matmul.allow_tf32 = True
+                torch.backends.cudnn.allow_tf32 = True
+                torch.backends.cudnn.benchmark = True
+                torch.set_float32_matmul_precision("high")
+            self._backend_ready = True
+
+    def _default_compute_type(self) -> str:
+        """int8 weights with fp16 activations on Turing+ GPUs, plain fp16 on older ones, int8 on CPU."""
+        if self.device != "cuda":
+            return "int8"
+        return "int8_float16" if torch.cuda.get_device_capability() >= (7, 5) else "float16"
+
+    def _get_asr_model(self):
+        with self._model_lock:
+            if self._asr_model is None:
+                print(f"Loading WhisperX model: {self.model_size} on {self.device} ({self.compute_type})...")
+                self._asr_model = whisperx.load_model(
+                    self.model_size,
+                    self.device,
+                    compute_type=self.compute_type
+                )
+            return self._asr_model
+
+    def _get_align_model(self, language_code: str):
+        with self._model_lock:
+            if language_code not in self._align_cache:
+                self._align_cache[language_code] = whisperx.load_align_model(
+                    language_code=language_code,
+                    device=self.device
+                )
+            return self._align_cache[language_code]
+
+    def _batch_size(self) -> int:
+        """Transcription batch size: scaled to free VRAM on CUDA, small on CPU (int8)."""
+        if Config.WHISPER_BATCH_SIZE:
+            return Config.WHISPER_BATCH_SIZE
+        if self.device == "cuda":
+            free_bytes, _ = torch.cuda.mem_get_info()
+            if free_bytes > 8e9:
+                return 32
+            return 16 if free_bytes > 4e9 else 8
+        return 4
+
+    def _load_audio_cached(self, audio_path: str):
+        """
+        whisperx.load_audio with the decoded 16 kHz float32 waveform cached under
+        Config.AUDIO_CACHE_DIR, keyed by the source's absolute path, mtime and size.
+        A cached waveform is memory-mapped instead of re-running ffmpeg; a changed
+        source gets a new key and is decoded again.
+        """
+        st = os.stat(audio_path)
+        key = hashlib.sha256(f"{os.path.abspath(audio_path)}|{st.st_mtime_ns}|{st.st_size}".encode("utf-8")).hexdigest()
+        cache_path = os.path.join(Config.AUDIO_CACHE_DIR, key + ".f32.npy")
+        try:
+            audio = np.load(cache_path, mmap_mode='r')
+            os.utime(cache_path)  # Mark as recently used for eviction
+            return audio
+        except (OSError, ValueError):
+            pass
+
+        audio = whisperx.load_audio(audio_path)
+        try:
+            os.makedirs(Config.AUDIO_CACHE_DIR, exist_ok=True)
+            tmp_path = cache_path + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, audio)
+            os.replace(tmp_path, cache_path)
+            evict_lru(Config.AUDIO_CACHE_DIR, Config.AUDIO_CACHE_MAX_BYTES, keep=cache_path)
+        except OSError as e:
+            print(f"Could not cache decoded audio: {e}")
+        return audio
+
+    def release(self):
+        """Drops the cached WhisperX models and frees their GPU memory."""
+        with self._model_lock:
+            self._asr_model = None
+            self._align_cache.clear()
+        if self.device == "cuda" and torch is not None:
+            torch.cuda.empty_cache()
 
     def generate_subtitles(self, audio_path: str):
         """
@@ -20,12 +151,14 @@ class SubtitleService:
         Saves SRT, Segments JSON, and Words JSON to disk.
         """
         segments = []
+        # Flat word list when the provider returns one (saves re-flattening segments)
+        words = None
         
         # Try Groq API first if key exists
         if Config.GROQ_API_KEY:
             try:
                 print("Attempting to use Groq Whisper API...")
-                segments = self._generate_groq_subtitles(audio_path)
+                segments, words = self._generate_groq_subtitles(audio_path)
             except Exception as e:
                 print(f"Groq API failed: {e}")
                 print("Falling back to local WhisperX...")
@@ -35,46 +168,51 @@ class SubtitleService:
 
         # Fallback to local
         if not segments:
+            words = None
             segments = self._generate_local_whisperx(audio_path)
 
         if segments:
-            self._save_outputs(audio_path, segments)
+            self._save_outputs(audio_path, segments, words)
 
         return segments
 
+    async def generate_subtitles_async(self, audio_path: str):
+        """
+        Awaitable version of generate_subtitles.
+        Transcription runs on a worker thread so the event loop stays free to overlap
+        other API calls (e.g. media fetches) with it.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.generate_subtitles, audio_path)
+
     def _generate_local_whisperx(self, audio_path: str):
-        print(f"Loading WhisperX model: {self.model_size} on {self.device} ({self.compute_type})...")
-        
         try:
-            # 1. Load Model
-            model = whisperx.load_model(
-                self.model_size,
-                self.device,
-                compute_type=self.compute_type
-            )
+            self._init_backend()
+
+            # 1. Load Model (cached after the first call)
+            model = self._get_asr_model()
             
             # 2. Load Audio
-            audio = whisperx.load_audio(audio_path)
+            audio = self._load_audio_cached(audio_path)
             
             # 3. Transcribe
             print("Transcribing...")
-            result = model.transcribe(audio, batch_size=16)
+            result = model.transcribe(audio, batch_size=self._batch_size())
             
             # 4. Align
             print("Aligning...")
-            model_a, metadata = whisperx.load_align_model(
-                language_code=result["language"],
-                device=self.device
-            )
+            model_a, metadata = self._get_align_model(result["language"])
             
-            result = whisperx.align(
-                result["segments"],
-                model_a,
-                metadata,
-                audio,
-                self.device,
-                return_char_alignments=False
-            )
+            # No autograd bookkeeping for the forward pass
+            with torch.inference_mode():
+                result = whisperx.align(
+                    result["segments"],
+                    model_a,
+                    metadata,
+                    audio,
+                    self.device,
+                    return_char_alignments=False
+                )
             return result["segments"]
 
         except Exception as e:
@@ -82,14 +220,9 @@ class SubtitleService:
             raise
 
     def _save_outputs(self, audio_path: str, segments: list, words_list: list = None):
-        """Save SRT, Segments JSON, and Words JSON."""
+        """Save SRT, Segments JSON, and Words JSON (written in parallel, each atomically)."""
         base_path = os.path.splitext(audio_path)[0]
         
-        # 1. Save Segments JSON
-        with open(base_path + "_segments.json", 'w', encoding='utf-8') as f:
-            json.dump(segments, f, indent=2, ensure_ascii=False)
-            
-        # 2. Save Words JSON
         # If explicit words_list is passed, use it. Otherwise extract from segments.
         final_words = []
         if words_list:
@@ -98,14 +231,16 @@ class SubtitleService:
             for seg in segments:
                 if "words" in seg:
                     final_words.extend(seg["words"])
-        
-        with open(base_path + "_words.json", 'w', encoding='utf-8') as f:
-            json.dump(final_words, f, indent=2, ensure_ascii=False)
-            
-        # 3. Save SRT
-        srt_content = segments_to_srt(segments)
-        with open(base_path + ".srt", 'w', encoding='utf-8') as f:
-            f.write(srt_content)
+
+        # The three files are independent, so their I/O overlaps
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [
+                executor.submit(_write_json, base_path + "_segments.json", segments),
+                executor.submit(_write_json, base_path + "_words.json", final_words),
+                executor.submit(_write_srt, base_path + ".srt", segments)
+            ]
+            for future in futures:
+                future.result()
             
         print(f"Saved subtitles to {base_path} [.srt, _segments.json, _words.json]")
 
@@ -113,7 +248,7 @@ class SubtitleService:
     def _generate_groq_subtitles(self, audio_path: str):
         """
         Generates subtitles using Groq's Whisper API.
-        Returns segments with embedded words.
+        Returns (segments with embedded words, flat time-ordered word list).
         """
         url = "https://api.groq.com/openai/v1/audio/transcriptions"
         
@@ -135,25 +270,26 @@ class SubtitleService:
                 }
                 
                 print(f"Sending request to Groq API ({url})...")
-                response = requests.post(url, headers=headers, files=files, data=data)
+                # Shared keep-alive session; long read timeout since transcription runs server-side
+                response = POST_SESSION.post(url, headers=headers, files=files, data=data, timeout=(10, 300))
                 
                 if response.status_code != 200:
                    raise Exception(f"Groq API Error {response.status_code}: {response.text}")
                 
-                result = response.json()
+                result = orjson.loads(response.content)
                 
                 segments = result.get("segments", [])
                 words = result.get("words", []) 
                 
                 if not segments and not words:
-                    return []
+                    return [], []
                 
                 # Merge words into segments to match expected structure
                 # and fix potential missing words in gaps
                 self._merge_words_into_segments(segments, words)
 
                 print(f"Groq transcription complete. {len(segments)} segments.")
-                return segments
+                return segments, words
                 
         except Exception as e:
             raise Exception(f"Failed to generate subtitles via Groq: {e}")
@@ -166,26 +302,22 @@ class SubtitleService:
         if not segments or not words:
             return
 
+        # Segments that already carry their own words keep the provider's alignment
+        if all(seg.get("words") for seg in segments):
+            return
+
+        # Words arrive in time order, so each segment's words are one contiguous slice:
+        # everything from the previous cut up to the first word starting at/after seg end
+        # (gap words before a segment fall into that segment)
+        # All cuts come from one vectorized binary search; the running max keeps the
+        # slices contiguous if a segment ends before the previous one
+        word_starts = np.fromiter((w.get("start", 0) for w in words), np.float64, count=len(words))
+        seg_ends = np.fromiter((seg.get("end", 0) for seg in segments), np.float64, count=len(segments))
+        cuts = np.maximum.accumulate(np.searchsorted(word_starts, seg_ends, side='left'))
         word_idx = 0
-        for seg in segments:
-            seg_start = seg.get("start", 0)
-            seg_end = seg.get("end", 0)
-            seg_words = []
-            
-            # Consume words until we pass the segment end
-            while word_idx < len(words):
-                w = words[word_idx]
-                w_start = w.get("start", 0)
-                
-                # Include word if it starts before this segment ends.
-                # This effectively grabs any words in the "gap" before this segment too.
-                if w_start < seg_end:
-                    seg_words.append(w)
-                    word_idx += 1
-                else:
-                    break
-            
-            seg["words"] = seg_words
+        for seg, cut in zip(segments, cuts.tolist()):
+            seg["words"] = words[word_idx:cut]
+            word_idx = cut
 
         # Append any leftovers to the last segment
         if word_idx < len(words) and segments:
@@ -194,5 +326,16 @@ class SubtitleService:
 
 
     def load_from_json(self, json_path: str):
-        with open(json_path, 'r') as f:
-            return json.load(f)
+        with open(json_path, 'rb') as f:
+            return orjson.loads(f.read())
+
+_instance = None
+_instance_lock = threading.Lock()
+
+def get_subtitle_service() -> SubtitleService:
+    """Process-wide SubtitleService, so loaded WhisperX models are reused by every caller."""
+    global _instance
+    with _instance_lock:
+        if _instance is None:
+            _instance = SubtitleService()
+        return _instance
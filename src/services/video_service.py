@@ -2,19 +2,264 @@ import threading
 import os
 import subprocess
 import shutil
+import functools
+import contextlib
+import hashlib
+import orjson
 from moviepy import (
-    ColorClip, VideoFileClip, ImageClip, AudioFileClip,
-    concatenate_videoclips, CompositeVideoClip, TextClip
+    ColorClip, VideoClip, VideoFileClip, ImageClip, AudioFileClip,
+    CompositeVideoClip, TextClip
 )
 import moviepy.video.fx as vfx
-import requests
+from moviepy.video.io import ffmpeg_writer
+import numpy as np
 import mimetypes
+from concurrent.futures import ThreadPoolExecutor
 from src.config import Config
+from src.utils.http_utils import SESSION
+from src.utils.async_utils import SingleFlight
+from src.utils.file_utils import link_or_copy, evict_lru
+from src.utils.subtitle_utils import write_srt
 import platform
 import random
 from proglog import ProgressBarLogger
 import time
 import datetime
+import tempfile
+
+try:
+    import fcntl  # POSIX only; used to widen the ffmpeg stdin pipe on Linux
+except ImportError:
+    fcntl = None
+
+try:
+    import av  # Multithreaded decoding of scene videos; MoviePy's reader is used without it
+except ImportError:
+    av = None
+
+try:
+    import pyvips  # Fused decode+resize of scene images (needs libvips)
+except (ImportError, OSError):
+    pyvips = None
+
+try:
+    import cv2  # SIMD resizes; MoviePy's PIL-based resize is used without it
+except ImportError:
+    cv2 = None
+
+# Frame rate of the exported video
+OUTPUT_FPS = 24
+
+# Hardware H.264 encoders tried in order: codec -> (preset, extra ffmpeg params)
+HW_ENCODERS = {
+    "h264_nvenc": ("p4", ["-rc", "vbr", "-cq", "23", "-b:v", "8M"]),
+    "h264_qsv": ("veryfast", ["-global_quality", "23"]),
+}
+
+def _hidden_startupinfo():
+    """STARTUPINFO that hides the console window of child processes on Windows."""
+    if os.name != 'nt':
+        return None
+    startupinfo = subprocess.STARTUPINFO()
+    startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    return startupinfo
+
+@functools.lru_cache(maxsize=1)
+def _detect_hw_encoder():
+    """
+    Returns the first hardware H.264 encoder that can actually encode here, or None.
+    Each candidate encodes a tiny test pattern, so an encoder compiled into ffmpeg
+    without a matching GPU/driver is not picked. Probed once per process.
+    """
+    from moviepy.config import FFMPEG_BINARY
+
+    for codec in HW_ENCODERS:
+        cmd = [
+            FFMPEG_BINARY, "-hide_banner", "-loglevel", "error",
+            "-f", "lavfi", "-i", "color=c=black:s=256x256:d=0.1",
+            "-c:v", codec, "-f", "null", "-"
+        ]
+        try:
+            result = subprocess.run(cmd, capture_output=True, timeout=15, startupinfo=_hidden_startupinfo())
+            if result.returncode == 0:
+                print(f"Using hardware video encoder: {codec}")
+                return codec
+        except (OSError, subprocess.SubprocessError):
+            pass
+    return None
+
+def get_encoder_settings():
+    """(codec, preset, ffmpeg_params) for write_videofile, honoring Config.VIDEO_ENCODER."""
+    choice = (Config.VIDEO_ENCODER or "auto").lower()
+    codec = _detect_hw_encoder() if choice == "auto" else choice
+    if codec in HW_ENCODERS:
+        preset, params = HW_ENCODERS[codec]
+        return codec, preset, list(params)
+    return "libx264", "ultrafast", None
+
+def fit_size(w, h, target_size):
+    """Size that fits (w, h) into target_size without cropping (exact target if ratios are within 5%)."""
+    target_w, target_h = target_size
+
+    # Calculate aspect ratios
+    clip_ratio = w / h
+    target_ratio = target_w / target_h
+    
+    # Check if aspect ratios are similar (within 5% tolerance)
+    ratio_match = abs(clip_ratio - target_ratio) / target_ratio < 0.05
+    
+    if ratio_match:
+        return target_w, target_h
+    scale_x = target_w / w
+    scale_y = target_h / h
+    scale = min(scale_x, scale_y)
+    return int(w * scale), int(h * scale)
+
+def _cv2_resizer(new_w, new_h):
+    """Frame -> resized frame with OpenCV (area averaging to shrink, bilinear to enlarge)."""
+    def resize(frame):
+        h, w = frame.shape[:2]
+        if (w, h) == (new_w, new_h):
+            return frame
+        interpolation = cv2.INTER_AREA if new_w < w else cv2.INTER_LINEAR
+        return cv2.resize(frame, (new_w, new_h), interpolation=interpolation)
+    return resize
+
+# Capacity requested for the pipe feeding raw frames to ffmpeg (default is 64 KiB on Linux)
+FFMPEG_PIPE_SIZE = 1 << 20
+
+class PipeVideoWriter(ffmpeg_writer.FFMPEG_VideoWriter):
+    """
+    FFMPEG_VideoWriter that writes each frame's buffer to ffmpeg directly instead of a
+    tobytes() copy, through a stdin pipe widened to FFMPEG_PIPE_SIZE where supported.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fcntl is not None and hasattr(fcntl, "F_SETPIPE_SZ"):
+            try:
+                fcntl.fcntl(self.proc.stdin.fileno(), fcntl.F_SETPIPE_SZ, FFMPEG_PIPE_SIZE)
+            except OSError:
+                pass  # Capped by /proc/sys/fs/pipe-max-size; the default pipe still works
+
+    def write_frame(self, img_array):
+        # Frames from iter_frames(dtype="uint8") are already uint8, so this is normally no copy
+        frame = np.ascontiguousarray(img_array, dtype=np.uint8)
+        try:
+            self.proc.stdin.write(frame.data)
+        except IOError:
+            # Let MoviePy turn the broken pipe into its detailed ffmpeg error
+            super().write_frame(frame)
+
+_MOVIEPY_VIDEO_WRITER = ffmpeg_writer.FFMPEG_VideoWriter
+
+@contextlib.contextmanager
+def pipe_video_writer():
+    """Makes write_videofile (which builds its writer through this module attribute) use PipeVideoWriter."""
+    ffmpeg_writer.FFMPEG_VideoWriter = PipeVideoWriter
+    try:
+        yield
+    finally:
+        ffmpeg_writer.FFMPEG_VideoWriter = _MOVIEPY_VIDEO_WRITER
+
+class PyAVSource:
+    """
+    RGB frame reader for a video file decoded by PyAV with FFmpeg frame/slice threading.
+    Frames are decoded forward for increasing t (the export order); going back or
+    jumping far ahead seeks to the nearest preceding keyframe first.
+    """
+    # Jumps further ahead than this (seconds) seek instead of decoding through
+    SEEK_THRESHOLD = 1.0
+
+    def __init__(self, path):
+        self.container = av.open(path)
+        try:
+            self.stream = self.container.streams.video[0]
+            self.stream.thread_type = "AUTO"
+            self.stream.thread_count = 0  # Let FFmpeg pick
+            self.fps = float(self.stream.average_rate or 24)
+            if self.stream.duration is not None:
+                self.duration = float(self.stream.duration * self.stream.time_base)
+            else:
+                self.duration = self.container.duration / av.time_base
+            # Frame timestamps count from the stream's start time; clip time t=0 maps to it
+            start_time = self.stream.start_time
+            self.start = float(start_time * self.stream.time_base) if start_time is not None else 0.0
+            self._seek(0)
+            if self._current is None:
+                raise ValueError("no video frames")
+            self.size = (self._current.width, self._current.height)
+            self.rotation = getattr(self._current, "rotation", 0)
+        except Exception:
+            self.container.close()
+            raise
+
+    def _seek(self, t):
+        self.container.seek(int((t + self.start) / self.stream.time_base), stream=self.stream, backward=True)
+        self._frames = self.container.decode(self.stream)
+        self._current = next(self._frames, None)
+        self._next = next(self._frames, None)
+        self._current_array = None
+
+    def get_frame(self, t):
+        pts = t + self.start
+        if self._current is None or pts < self._current.time or pts - self._current.time > self.SEEK_THRESHOLD:
+            self._seek(t)
+        # Advance to the last frame starting at or before t (the last frame is held past the end)
+        while self._next is not None and self._next.time <= pts + 1e-6:
+            self._current, self._next = self._next, next(self._frames, None)
+            self._current_array = None
+        if self._current_array is None:
+            self._current_array = self._current.to_ndarray(format="rgb24")
+        return self._current_array
+
+    def close(self):
+        self.container.close()
+
+class PyAVVideoClip(VideoClip):
+    """Video-only clip backed by a PyAVSource (scene audio is replaced by the narration anyway)."""
+    def __init__(self, path):
+        self.source = PyAVSource(path)
+        super().__init__(self.source.get_frame, duration=self.source.duration)
+        self.fps = self.source.fps
+
+    def close(self):
+        if self.source:
+            self.source.close()
+            self.source = None
+        super().close()
+
+def _subtitle_font():
+    """Caption font for this platform (a file name on Windows, generally safer with ImageMagick/MoviePy)."""
+    if platform.system() == 'Windows':
+        return 'arial.ttf'
+    return 'Arial'
+
+def _render_subtitle(text, font_size, font_name, width):
+    """Rasterizes a caption; returns its RGB frame (uint8) and mask (float32) arrays."""
+    try:
+        # Create text clip
+        txt_clip = TextClip(
+            text=text,
+            font_size=font_size,
+            color='white',
+            stroke_color='black',
+            stroke_width=2,
+            method='caption',
+            size=(width, None),
+            font=font_name
+        )
+    except Exception as font_err:
+        print(f"Font error ({font_name}), trying default: {font_err}")
+        txt_clip = TextClip(
+            text=text,
+            font_size=font_size,
+            color='white',
+            stroke_color='black',
+            stroke_width=2,
+            method='caption',
+            size=(width, None)
+        )
+    return txt_clip.get_frame(0), txt_clip.mask.get_frame(0).astype(np.float32)
 
 class MyBarLogger(ProgressBarLogger):
     
@@ -52,6 +297,9 @@ class MyBarLogger(ProgressBarLogger):
             self.last_print = current_time
 
 class VideoService:
+    # Concurrent downloads of the same URL share one fetch
+    _inflight = SingleFlight()
+
     def __init__(self):
         self.temp_clips = []
         self.stop_event = threading.Event()
@@ -66,57 +314,140 @@ class VideoService:
         Download media file from URL and determine correct extension.
         Returns the full path to the saved file.
         Explicitly rejects SVG files as they are often problematic.
+        Downloads are cached by URL hash; a cached file is revalidated with a
+        conditional GET and linked/copied into place when unchanged.
         """
         try:
             print(f"Downloading: {url}")
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-            }
+            key = hashlib.blake2b(url.encode("utf-8"), digest_size=16).hexdigest()
+            # Scenes sharing a URL (downloaded concurrently) fetch it once
+            cache_path = self._inflight.do(("media", key), self._fetch_to_cache, url, key)
 
-            response = requests.get(url, headers=headers, stream=True, timeout=30)
-            response.raise_for_status()
-
-            # Determine extension from Content-Type or URL
-            content_type = response.headers.get('content-type', '')
-            ext = mimetypes.guess_extension(content_type)
-            
-            # Check for SVG content type
-            if 'svg' in content_type or (ext and '.svg' in ext):
-                raise Exception(f"Skipping SVG file (unsupported format): {url}")
-
-            if not ext:
-                # Fallback to URL parsing
-                if '.jpg' in url.lower() or '.jpeg' in url.lower():
-                    ext = '.jpg'
-                elif '.png' in url.lower():
-                    ext = '.png'
-                elif '.mp4' in url.lower():
-                    ext = '.mp4'
-                elif '.svg' in url.lower(): # catch url based svg
-                    raise Exception(f"Skipping SVG file (unsupported format): {url}")
-                else:
-                    ext = '.mp4' # Default fallback, potentially risky
-            
-            # Additional safety: check if resolved extension is svg
-            if ext == '.svg':
-                raise Exception(f"Skipping SVG file (unsupported format): {url}")
-
-            # Normalize extension
-            if ext == '.jpe': ext = '.jpg'
-            
+            ext = os.path.splitext(cache_path)[1]
             filename = f"scene_{scene_id}_media{ext}"
             output_path = os.path.join(output_dir, filename)
-            
-            with open(output_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+            link_or_copy(cache_path, output_path)
             
             print(f"✓ Downloaded to {output_path}")
             return output_path
         except Exception as e:
             print(f"✗ Failed to download {url}: {e}")
             raise # Re-raise to stop process
-    
+
+    def _fetch_to_cache(self, url, key):
+        """Returns the path of the cached copy of url, downloading it only if missing or changed."""
+        cache_dir = Config.MEDIA_CACHE_DIR
+        os.makedirs(cache_dir, exist_ok=True)
+        meta_path = os.path.join(cache_dir, key + ".json")
+
+        meta = None
+        try:
+            with open(meta_path, 'rb') as f:
+                meta = orjson.loads(f.read())
+            if not os.path.exists(os.path.join(cache_dir, key + meta["ext"])):
+                meta = None
+        except (OSError, ValueError, KeyError):
+            meta = None
+
+        headers = {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+        }
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        # Shared keep-alive session: no new TCP/TLS handshake per media URL
+        with SESSION.get(url, headers=headers, stream=True, timeout=30) as response:
+            if meta:
+                cached_path = os.path.join(cache_dir, key + meta["ext"])
+                # Unchanged: 304 to our validators or, without validators, the same size
+                unchanged = response.status_code == 304 or (
+                    not meta.get("etag") and not meta.get("last_modified")
+                    and response.headers.get("content-length") == str(meta.get("size"))
+                )
+                if unchanged:
+                    os.utime(cached_path)  # Mark as recently used for eviction
+                    print("✓ Using cached media")
+                    return cached_path
+
+            response.raise_for_status()
+            ext = self._media_extension(response.headers.get('content-type', ''), url)
+            cache_path = os.path.join(cache_dir, key + ext)
+
+            # Write to a temp file first so a failed download never leaves a partial file behind
+            tmp_path = cache_path + ".tmp"
+            # Copy the (decoded) socket stream in 1 MiB blocks instead of 8 KiB Python iterations
+            response.raw.decode_content = True
+            with open(tmp_path, 'wb') as f:
+                shutil.copyfileobj(response.raw, f, length=1 << 20)
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+
+        os.replace(tmp_path, cache_path)
+        with open(meta_path, 'wb') as f:
+            f.write(orjson.dumps({
+                "url": url,
+                "ext": ext,
+                "etag": etag,
+                "last_modified": last_modified,
+                "size": os.path.getsize(cache_path)
+            }))
+        self._evict_media_cache(keep=cache_path)
+        return cache_path
+
+    def _media_extension(self, content_type, url):
+        """File extension from Content-Type or URL; raises for SVG."""
+        ext = mimetypes.guess_extension(content_type)
+        
+        # Check for SVG content type
+        if 'svg' in content_type or (ext and '.svg' in ext):
+            raise Exception(f"Skipping SVG file (unsupported format): {url}")
+
+        if not ext:
+            # Fallback to URL parsing
+            if '.jpg' in url.lower() or '.jpeg' in url.lower():
+                ext = '.jpg'
+            elif '.png' in url.lower():
+                ext = '.png'
+            elif '.mp4' in url.lower():
+                ext = '.mp4'
+            elif '.svg' in url.lower(): # catch url based svg
+                raise Exception(f"Skipping SVG file (unsupported format): {url}")
+            else:
+                ext = '.mp4' # Default fallback, potentially risky
+        
+        # Additional safety: check if resolved extension is svg
+        if ext == '.svg':
+            raise Exception(f"Skipping SVG file (unsupported format): {url}")
+
+        # Normalize extension
+        if ext == '.jpe': ext = '.jpg'
+        return ext
+
+    def _evict_media_cache(self, keep=None):
+        """Removes least recently used cached media until the cache fits Config.MEDIA_CACHE_MAX_BYTES."""
+        evict_lru(Config.MEDIA_CACHE_DIR, Config.MEDIA_CACHE_MAX_BYTES, keep=keep)
+
+    def download_scene_media(self, scenes, output_dir):
+        """
+        Downloads the media of every scene that has a media_url but no local media_path,
+        concurrently, and stores the resulting path on the scene as media_path.
+        """
+        pending = [s for s in scenes if s.get('media_url') and not s.get('media_path')]
+        if not pending:
+            return
+
+        print(f"Downloading media for {len(pending)} scenes...")
+        with ThreadPoolExecutor(max_workers=Config.MEDIA_FETCH_WORKERS) as executor:
+            paths = executor.map(
+                lambda s: self.download_media(s['media_url'], output_dir, s['id']),
+                pending
+            )
+            for scene, path in zip(pending, paths):
+                scene['media_path'] = path
+
     def smart_fit(self, clip, target_size=(1920, 1080)):
         """
         Smart fit clip to target size without cropping.
@@ -124,41 +455,43 @@ class VideoService:
         """
         try:
             w, h = clip.w, clip.h
-            target_w, target_h = target_size
             
             # Safety check
             if w is None or h is None or w == 0 or h == 0:
                 print("Warning: Clip has invalid dimensions in smart_fit. Skipping resize.")
                 return clip
 
-            # Calculate aspect ratios
-            clip_ratio = w / h
-            target_ratio = target_w / target_h
-            
-            # Check if aspect ratios are similar (within 5% tolerance)
-            ratio_match = abs(clip_ratio - target_ratio) / target_ratio < 0.05
-            
-            if ratio_match:
-                new_w, new_h = target_w, target_h
-            else:
-                scale_x = target_w / w
-                scale_y = target_h / h
-                scale = min(scale_x, scale_y)
-                new_w = int(w * scale)
-                new_h = int(h * scale)
+            new_w, new_h = fit_size(w, h, target_size)
             
+            if cv2 is not None:
+                # Images are resized once; video frames are resized as they are decoded
+                return clip.image_transform(_cv2_resizer(new_w, new_h), apply_to=["mask"])
+
             # MoviePy 2.2.1: resized method
             return clip.resized(new_size=(new_w, new_h))
         except Exception as e:
             print(f"Error in smart_fit: {e}")
             return clip # Return original if resize fails
 
+    def _open_video(self, video_path):
+        """Opens a scene video with PyAV when available, else with MoviePy's ffmpeg reader."""
+        if av is not None:
+            try:
+                clip = PyAVVideoClip(video_path)
+                if not clip.source.rotation:
+                    return clip
+                # Rotated (phone) videos keep MoviePy's rotation handling
+                clip.close()
+            except Exception as e:
+                print(f"  PyAV could not open {os.path.basename(video_path)} ({e}); using ffmpeg reader")
+        return VideoFileClip(video_path)
+
     def trim_or_loop_video(self, video_path, target_duration, resolution=(1920, 1080)):
         """
         Trim or loop video to match target duration and resolution.
         """
         try:
-            video = VideoFileClip(video_path)
+            video = self._open_video(video_path)
             
             # Smart fit first
             video = self.smart_fit(video, target_size=resolution)
@@ -191,112 +524,231 @@ class VideoService:
             scale_factor = 1.4
             
             # Calculate new dimensions preserving aspect ratio
-            # note: clip.resized(height=...) maintains aspect ratio
-            clip = clip.resized(height=int(h * scale_factor))
-            
-            # Dimensions of the resized clip
-            cw, ch = clip.w, clip.h
-            
-            # Maximum allowed movement (offset) in pixels
-            max_x_move = (cw - w) // 2 
-            max_y_move = (ch - h) // 2
+            big_frame = None
+            if cv2 is not None:
+                # Resize the still image once; frames are then cut from this array
+                ch = int(h * scale_factor)
+                cw = int(clip.w * ch / clip.h)
+                big_frame = cv2.resize(clip.get_frame(0), (cw, ch), interpolation=cv2.INTER_CUBIC)
+                big_mask = None
+                if clip.mask is not None:
+                    big_mask = cv2.resize(clip.mask.get_frame(0), (cw, ch), interpolation=cv2.INTER_CUBIC)
+            else:
+                # note: clip.resized(height=...) maintains aspect ratio
+                clip = clip.resized(height=int(h * scale_factor))
+                
+                # Dimensions of the resized clip
+                cw, ch = clip.w, clip.h
             
-            # Select a random animation effect
-            effects = ['pan_left', 'pan_right', 'pan_up', 'pan_down', 'zoom_in', 'zoom_out']
-            effect = random.choice(effects)
+            get_pos = self._ken_burns_path(resolution, cw, ch, duration)
+
+            # Sample the path once per output frame; per-frame calls become a table lookup
+            n_samples = int(duration * OUTPUT_FPS) + 1
+            positions = [get_pos(i / OUTPUT_FPS) for i in range(n_samples)]
+
+            def pos_func(t):
+                return positions[min(max(int(round(t * OUTPUT_FPS)), 0), n_samples - 1)]
+
+            if big_frame is not None:
+                if cw >= w:
+                    return self._pan_window_clip(big_frame, big_mask, pos_func, resolution, duration)
+                # Narrower than the frame: position the enlarged image instead
+                clip = ImageClip(big_frame).with_duration(duration)
+                if big_mask is not None:
+                    clip = clip.with_mask(ImageClip(big_mask, is_mask=True).with_duration(duration))
+
+            return clip.with_position(pos_func)
             
-            print(f"    - Applying effect: {effect}")
+        except Exception as e:
+            print(f"Error applying image animation: {e}")
+            return clip
 
-            # Easing function (Quadratic Ease-Out)
-            def get_eased_progress(t):
-                p = t / duration
-                return 1 - (1 - p)**2
+    def _ken_burns_path(self, resolution, cw, ch, duration):
+        """
+        Picks a random Ken Burns effect for an image enlarged to (cw, ch) and returns its
+        position function: t -> top-left (x, y) of the image on the canvas, 'center' per axis.
+        """
+        w, h = resolution
 
-            # Position calculators
-            def get_pos(t):
-                progress = get_eased_progress(t)
-                
-                # Default centered position
-                center_x = (w - cw) // 2
-                center_y = (h - ch) // 2
-                
-                x, y = center_x, center_y # Start at center (which implies cropping center)
-                                            # Wait, moviepy coords are top-left of the clip relative to bg
-                                            # We want to center the crop. 
-                                            # If clip is at (x,y), the visible part is -x, -y from clip's top-left
-                                            # Actually, simpler: 
-                                            # We want the clip CENTER to move relative to the frame CENTER.
-                                            # So we use ('center', 'center') logic effectively.
+        # Maximum allowed movement (offset) in pixels
+        max_x_move = (cw - w) // 2 
+        max_y_move = (ch - h) // 2
+        
+        # Select a random animation effect
+        effects = ['pan_left', 'pan_right', 'pan_up', 'pan_down', 'zoom_in', 'zoom_out']
+        effect = random.choice(effects)
+        
+        print(f"    - Applying effect: {effect}")
+
+        # Easing function (Quadratic Ease-Out)
+        def get_eased_progress(t):
+            p = t / duration
+            return 1 - (1 - p)**2
+
+        # Position calculators
+        def get_pos(t):
+            progress = get_eased_progress(t)
+            
+            # Default centered position
+            center_x = (w - cw) // 2
+            center_y = (h - ch) // 2
+            
+            x, y = center_x, center_y # Start at center (which implies cropping center)
+                                        # Wait, moviepy coords are top-left of the clip relative to bg
+                                        # We want to center the crop. 
+                                        # If clip is at (x,y), the visible part is -x, -y from clip's top-left
+                                        # Actually, simpler: 
+                                        # We want the clip CENTER to move relative to the frame CENTER.
+                                        # So we use ('center', 'center') logic effectively.
+            
+            # Let's calculate top-left coordinates (x, y) relative to canvas (0,0)
+            # To center the big clip on the small canvas:
+            # x = (w - cw) / 2
+            # y = (h - ch) / 2
+            
+            # Movement implies shifting away from this center
+            
+            if effect == 'pan_left':
+                # Move Left: Image moves LEFT, so we see more of the RIGHT side.
+                # Start: x + offset -> End: x - offset
+                start_x = center_x + (max_x_move * 0.5)
+                end_x = center_x - (max_x_move * 0.5)
+                curr_x = start_x + (end_x - start_x) * progress
+                return (int(curr_x), 'center')
                 
-                # Let's calculate top-left coordinates (x, y) relative to canvas (0,0)
-                # To center the big clip on the small canvas:
-                # x = (w - cw) / 2
-                # y = (h - ch) / 2
+            elif effect == 'pan_right':
+                # Move Right: Image moves RIGHT
+                start_x = center_x - (max_x_move * 0.5)
+                end_x = center_x + (max_x_move * 0.5)
+                curr_x = start_x + (end_x - start_x) * progress
+                return (int(curr_x), 'center')
                 
-                # Movement implies shifting away from this center
+            elif effect == 'pan_up':
+                # Move Up: Image moves UP
+                start_y = center_y + (max_y_move * 0.5)
+                end_y = center_y - (max_y_move * 0.5)
+                curr_y = start_y + (end_y - start_y) * progress
+                return ('center', int(curr_y))
                 
-                if effect == 'pan_left':
-                    # Move Left: Image moves LEFT, so we see more of the RIGHT side.
-                    # Start: x + offset -> End: x - offset
-                    start_x = center_x + (max_x_move * 0.5)
-                    end_x = center_x - (max_x_move * 0.5)
-                    curr_x = start_x + (end_x - start_x) * progress
-                    return (int(curr_x), 'center')
-                    
-                elif effect == 'pan_right':
-                    # Move Right: Image moves RIGHT
-                    start_x = center_x - (max_x_move * 0.5)
-                    end_x = center_x + (max_x_move * 0.5)
-                    curr_x = start_x + (end_x - start_x) * progress
-                    return (int(curr_x), 'center')
-                    
-                elif effect == 'pan_up':
-                    # Move Up: Image moves UP
-                    start_y = center_y + (max_y_move * 0.5)
-                    end_y = center_y - (max_y_move * 0.5)
-                    curr_y = start_y + (end_y - start_y) * progress
-                    return ('center', int(curr_y))
-                    
-                elif effect == 'pan_down':
-                    # Move Down
-                    start_y = center_y - (max_y_move * 0.5)
-                    end_y = center_y + (max_y_move * 0.5)
-                    curr_y = start_y + (end_y - start_y) * progress
-                    return ('center', int(curr_y))
+            elif effect == 'pan_down':
+                # Move Down
+                start_y = center_y - (max_y_move * 0.5)
+                end_y = center_y + (max_y_move * 0.5)
+                curr_y = start_y + (end_y - start_y) * progress
+                return ('center', int(curr_y))
+            
+            elif 'zoom' in effect:
+                # For zoom, we just center it. 
+                # Real zoom requires resizing per frame which is expensive/complex in basic MoviePy.
+                # We will simulate "Zoom" by a gentle forward movement (Pan Up+Left) 
+                # OR we can just fallback to a slow Pan for now as true Zoom is hard with just position.
+                # HOWEVER, we can do a 'fake' zoom by sliding diagonals.
                 
-                elif 'zoom' in effect:
-                    # For zoom, we just center it. 
-                    # Real zoom requires resizing per frame which is expensive/complex in basic MoviePy.
-                    # We will simulate "Zoom" by a gentle forward movement (Pan Up+Left) 
-                    # OR we can just fallback to a slow Pan for now as true Zoom is hard with just position.
-                    # HOWEVER, we can do a 'fake' zoom by sliding diagonals.
-                    
-                    # Let's do a Diagonal Pan for "Zoom" effect feel
-                    if effect == 'zoom_in':
-                        # Slide Diagonally In (Top-Left to Center)
-                        s_x, e_x = center_x - max_x_move*0.3, center_x + max_x_move*0.3
-                        s_y, e_y = center_y - max_y_move*0.3, center_y + max_y_move*0.3
-                        return (int(s_x + (e_x-s_x)*progress), int(s_y + (e_y-s_y)*progress))
-                    else:
-                        # Zoom out roughly
-                        s_x, e_x = center_x + max_x_move*0.3, center_x - max_x_move*0.3
-                        s_y, e_y = center_y + max_y_move*0.3, center_y - max_y_move*0.3
-                        return (int(s_x + (e_x-s_x)*progress), int(s_y + (e_y-s_y)*progress))
+                # Let's do a Diagonal Pan for "Zoom" effect feel
+                if effect == 'zoom_in':
+                    # Slide Diagonally In (Top-Left to Center)
+                    s_x, e_x = center_x - max_x_move*0.3, center_x + max_x_move*0.3
+                    s_y, e_y = center_y - max_y_move*0.3, center_y + max_y_move*0.3
+                    return (int(s_x + (e_x-s_x)*progress), int(s_y + (e_y-s_y)*progress))
+                else:
+                    # Zoom out roughly
+                    s_x, e_x = center_x + max_x_move*0.3, center_x - max_x_move*0.3
+                    s_y, e_y = center_y + max_y_move*0.3, center_y - max_y_move*0.3
+                    return (int(s_x + (e_x-s_x)*progress), int(s_y + (e_y-s_y)*progress))
 
-                return ('center', 'center')
+            return ('center', 'center')
 
-            return clip.with_position(get_pos)
-            
-        except Exception as e:
-            print(f"Error applying image animation: {e}")
-            return clip
+        return get_pos
+
+    def _pan_window_clip(self, big_frame, big_mask, pos_func, resolution, duration):
+        """
+        Frame-sized clip showing the window of big_frame that pos_func would place on screen.
+        Each frame is a view into the enlarged image, so the compositor only blends
+        resolution-sized frames instead of the whole enlarged bitmap.
+        """
+        w, h = resolution
+        ch, cw = big_frame.shape[:2]
+
+        def window(t):
+            x, y = pos_func(t)
+            # Top-left of the enlarged image on the canvas -> top-left of the visible window
+            left = (cw - w) // 2 if x == 'center' else -x
+            top = (ch - h) // 2 if y == 'center' else -y
+            left = min(max(left, 0), cw - w)
+            top = min(max(top, 0), ch - h)
+            return left, top
+
+        def frame_function(t):
+            left, top = window(t)
+            return big_frame[top:top + h, left:left + w]
+
+        clip = VideoClip(frame_function, duration=duration)
+        if big_mask is not None:
+            def mask_function(t):
+                left, top = window(t)
+                return big_mask[top:top + h, left:left + w]
+            clip = clip.with_mask(VideoClip(mask_function, is_mask=True, duration=duration))
+        return clip.with_position("center")
+
+    def _load_fitted_image(self, image_path, resolution):
+        """
+        Decodes an image straight to its smart_fit size, with libvips if available, else
+        OpenCV. Returns (rgb uint8 array, alpha mask or None), or None when neither is
+        available or can read the file (the caller then falls back to ImageClip).
+        """
+        if pyvips is not None:
+            try:
+                # Opening only reads the header
+                header = pyvips.Image.new_from_file(image_path)
+                new_w, new_h = fit_size(header.width, header.height, resolution)
+                # no_rotate: match ImageClip, which ignores EXIF orientation
+                img = pyvips.Image.thumbnail(image_path, new_w, height=new_h, size="force", no_rotate=True)
+                if img.interpretation != "srgb" or img.format != "uchar":
+                    img = img.colourspace("srgb").cast("uchar")
+                arr = np.ndarray(buffer=img.write_to_memory(), dtype=np.uint8, shape=[img.height, img.width, img.bands])
+                mask = arr[:, :, 3] / 255.0 if img.bands == 4 else None
+                return np.ascontiguousarray(arr[:, :, :3]), mask
+            except Exception as e:
+                print(f"  libvips could not load {os.path.basename(image_path)} ({e})")
+
+        if cv2 is not None:
+            # IMREAD_UNCHANGED keeps alpha and, like ImageClip, ignores EXIF orientation
+            img = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+            if img is not None:
+                if img.dtype == np.uint16:
+                    img = (img >> 8).astype(np.uint8)
+                if img.dtype == np.uint8:
+                    mask = None
+                    if img.ndim == 2:
+                        rgb = cv2.cvtColor(img, cv2.COLOR_GRAY2RGB)
+                    elif img.shape[2] == 4:
+                        rgb = cv2.cvtColor(img, cv2.COLOR_BGRA2RGB)
+                        mask = img[:, :, 3]
+                    else:
+                        rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+                    new_w, new_h = fit_size(rgb.shape[1], rgb.shape[0], resolution)
+                    resize = _cv2_resizer(new_w, new_h)
+                    rgb = resize(rgb)
+                    if mask is not None:
+                        mask = resize(mask) / 255.0
+                    return rgb, mask
+
+        return None
 
     def image_to_clip(self, image_path, duration, resolution=(1920, 1080)):
         """Convert image to video clip with specified resolution."""
         try:
             print(f"  Creating {duration:.2f}s clip from image: {os.path.basename(image_path)}")
-            clip = ImageClip(image_path).with_duration(duration)
-            clip = self.smart_fit(clip, target_size=resolution)
+            fitted = self._load_fitted_image(image_path, resolution)
+            if fitted is not None:
+                # Already at the smart_fit size
+                frame, mask = fitted
+                clip = ImageClip(frame).with_duration(duration)
+                if mask is not None:
+                    clip = clip.with_mask(ImageClip(mask, is_mask=True).with_duration(duration))
+            else:
+                clip = ImageClip(image_path).with_duration(duration)
+                clip = self.smart_fit(clip, target_size=resolution)
             
             if Config.IMAGE_ANIMATION_ENABLED:
                 print("  Applying image animation...")
@@ -378,10 +830,10 @@ class VideoService:
                  base_font_size = 40
             
             # Determine font
-            font_name = 'Arial'
-            if platform.system() == 'Windows':
-                 font_name = 'arial.ttf' # Generally safer on Windows with ImageMagick/MoviePy
+            font_name = _subtitle_font()
             
+            # Repeated captions reuse one rasterization; scoped to this render so it is freed afterwards
+            rendered = {}
             for segment in subtitle_segments:
                 if 'start' not in segment or 'end' not in segment or 'text' not in segment:
                     continue
@@ -391,30 +843,10 @@ class VideoService:
                 end = float(segment['end'])
                 duration = end - start
                 
-                try:
-                    # Create text clip
-                    txt_clip = TextClip(
-                        text=text,
-                        font_size=base_font_size,
-                        color='white',
-                        stroke_color='black',
-                        stroke_width=2,
-                        method='caption',
-                        size=(video_clip.w - 50, None),
-                        font=font_name 
-                    )
-                except Exception as font_err:
-                     print(f"Font error ({font_name}), trying default: {font_err}")
-                     txt_clip = TextClip(
-                        text=text,
-                        font_size=base_font_size,
-                        color='white',
-                        stroke_color='black',
-                        stroke_width=2,
-                        method='caption',
-                        size=(video_clip.w - 50, None)
-                    )
-
+                if text not in rendered:
+                    rendered[text] = _render_subtitle(text, base_font_size, font_name, video_clip.w - 50)
+                frame, mask = rendered[text]
+                txt_clip = ImageClip(frame).with_mask(ImageClip(mask, is_mask=True))
                 txt_clip = txt_clip.with_position(('center', 'bottom')).with_duration(duration).with_start(start)
                 subtitle_clips.append(txt_clip)
             
@@ -457,30 +889,60 @@ class VideoService:
                 duration=audio_duration
             )
             
+            # Fetch all remote media up front so network waits overlap
+            if progress_callback:
+                progress_callback("Downloading scene media...", 5)
+            self.download_scene_media(scenes, output_dir)
+
+            if self.stop_event.is_set(): raise Exception("Video generation stopped by user.")
+
+            if Config.VIDEO_RENDERER == "ffmpeg":
+                try:
+                    self.render_with_ffmpeg(scenes, audio_path, output_path, audio_duration,
+                                            subtitle_segments, resolution, progress_callback)
+                    audio.close()
+                    print("\n" + "="*60)
+                    print(f"✓ VIDEO GENERATION COMPLETE: {output_path}")
+                    print("="*60)
+                    return output_path
+                except Exception as e:
+                    if self.stop_event.is_set():
+                        raise
+                    print(f"ffmpeg renderer failed ({e}); falling back to MoviePy")
+
             # Process Scenes
+            # Scene decode/resize (libvips, OpenCV, PyAV) releases the GIL, so scenes are built in parallel
             scene_clips = []
-            for i, scene in enumerate(scenes):
-                if self.stop_event.is_set(): raise Exception("Video generation stopped by user.")
+            with ThreadPoolExecutor(max_workers=Config.SCENE_BUILD_WORKERS) as executor:
+                futures = [executor.submit(self.create_scene_clip, scene, output_dir, resolution) for scene in scenes]
+                try:
+                    for i, (scene, future) in enumerate(zip(scenes, futures)):
+                        if self.stop_event.is_set(): raise Exception("Video generation stopped by user.")
 
-                if progress_callback:
-                    progress_callback(f"Processing scene {i+1}/{len(scenes)}", 10 + (i/len(scenes)*10))
+                        if progress_callback:
+                            progress_callback(f"Processing scene {i+1}/{len(scenes)}", 10 + (i/len(scenes)*10))
 
-                # We do NOT use try/except here so that errors bubble up and stop functionality
-                clip = self.create_scene_clip(scene, output_dir, resolution)
-                
-                start_time = float(scene['start_time'])
-                end_time = float(scene['end_time'])
-                duration = end_time - start_time
-                
-                if clip.duration != duration:
-                        clip = clip.with_duration(duration)
+                        # We do NOT use try/except here so that errors bubble up and stop functionality
+                        clip = future.result()
+                        
+                        start_time = float(scene['start_time'])
+                        end_time = float(scene['end_time'])
+                        duration = end_time - start_time
+                        
+                        if clip.duration != duration:
+                                clip = clip.with_duration(duration)
 
-                clip = clip.with_start(start_time)
-                
-                # Ensure properly positioned - MOVED responsbility to create_scene_clip/image_to_clip
-                # clip = clip.with_position("center") # REMOVED: Overwrites animation
+                        clip = clip.with_start(start_time)
+                        
+                        # Ensure properly positioned - MOVED responsbility to create_scene_clip/image_to_clip
+                        # clip = clip.with_position("center") # REMOVED: Overwrites animation
 
-                scene_clips.append(clip)
+                        scene_clips.append(clip)
+                except BaseException:
+                    # Don't start scenes that are still queued
+                    for future in futures:
+                        future.cancel()
+                    raise
             
             if not scene_clips:
                 raise Exception("No valid scene clips created.")
@@ -503,15 +965,18 @@ class VideoService:
             #saving the progess in a varibale instead of terminal
             # Pass lambda to check threading event
             logger = MyBarLogger(cancel_check=lambda: self.stop_event.is_set(), progress_callback=progress_callback)
-            final_video.write_videofile(
-                output_path,
-                codec='libx264',
-                audio_codec='aac',
-                fps=24,
-                threads=8,
-                preset='ultrafast', 
-                logger=logger
-            )
+            codec, preset, ffmpeg_params = get_encoder_settings()
+            with pipe_video_writer():
+                final_video.write_videofile(
+                    output_path,
+                    codec=codec,
+                    audio_codec='aac',
+                    fps=OUTPUT_FPS,
+                    threads=8,
+                    preset=preset,
+                    ffmpeg_params=ffmpeg_params,
+                    logger=logger
+                )
             
             print("\nCleaning up...")
             for clip in self.temp_clips:
@@ -530,6 +995,178 @@ class VideoService:
                 except: pass
             self.temp_clips = []
             # Stop the whole process if a scene fails
+
+    def render_with_ffmpeg(self, scenes, audio_path, output_path, audio_duration,
+                           subtitle_segments=None, resolution=(1920, 1080), progress_callback=None):
+        """
+        Renders the final video with a single ffmpeg -filter_complex graph: every scene is
+        scaled and overlaid onto a black canvas during its time range (images panned with
+        the same Ken Burns path as the MoviePy renderer), subtitles are drawn by libass and
+        the narration is muxed in. No frame passes through Python.
+        """
+        from PIL import Image
+        from moviepy.config import FFMPEG_BINARY
+
+        w, h = resolution
+        inputs = ["-i", audio_path]
+        filters = [f"color=c=black:s={w}x{h}:r={OUTPUT_FPS}:d={audio_duration:.3f}[base]"]
+        last = "base"
+        n_overlays = 0
+
+        for scene in scenes:
+            media_path = scene.get('media_path')
+            if not media_path or not os.path.exists(media_path):
+                raise Exception(f"No media available for scene {scene.get('id')}")
+            lower_path = media_path.lower()
+            if lower_path.endswith('.svg'):
+                raise Exception("SVG files are not supported.")
+
+            start = float(scene['start_time'])
+            duration = float(scene['end_time']) - start
+            if duration <= 0:
+                continue
+            index = n_overlays + 1  # Input 0 is the narration
+            ease = f"(1-pow(1-(t-{start:.3f})/{duration:.3f},2))"
+
+            if lower_path.endswith(('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp')):
+                with Image.open(media_path) as img:
+                    fw, fh = fit_size(img.width, img.height, resolution)
+                inputs += ["-noautorotate", "-i", media_path]
+                if Config.IMAGE_ANIMATION_ENABLED:
+                    ch = int(h * 1.4)
+                    cw = int(fw * ch / fh)
+                    get_pos = self._ken_burns_path(resolution, cw, ch, duration)
+                    (x0, y0), (x1, y1) = get_pos(0), get_pos(duration)
+                    x = "(W-w)/2" if x0 == 'center' else f"{x0}+({x1 - x0})*{ease}"
+                    y = "(H-h)/2" if y0 == 'center' else f"{y0}+({y1 - y0})*{ease}"
+                else:
+                    cw, ch = fw, fh
+                    x, y = "(W-w)/2", "(H-h)/2"
+                # Decode and scale the still once, then repeat that frame for the scene
+                source = (
+                    f"[{index}:v]scale={cw}:{ch}:flags=bicubic,loop=loop=-1:size=1:start=0,"
+                    f"setpts=N/{OUTPUT_FPS}/TB,trim=duration={duration:.3f},"
+                    f"setpts=PTS+{start:.3f}/TB[s{index}]"
+                )
+            else:
+                # Loop short clips and trim long ones at the demuxer
+                inputs += ["-stream_loop", "-1", "-t", f"{duration:.3f}", "-i", media_path]
+                # smart_fit: exact frame size within 5% aspect ratio, else fit inside
+                ratio = w / h
+                fit = f"if(lt(abs(a-{ratio})/{ratio},0.05),{{exact}},trunc({{side}}*min({w}/iw,{h}/ih)))"
+                sw = fit.format(exact=w, side="iw")
+                sh = fit.format(exact=h, side="ih")
+                source = (
+                    f"[{index}:v]scale=w='{sw}':h='{sh}',fps={OUTPUT_FPS},"
+                    f"setpts=PTS-STARTPTS+{start:.3f}/TB[s{index}]"
+                )
+                x, y = "(W-w)/2", "(H-h)/2"
+
+            filters.append(source)
+            filters.append(
+                f"[{last}][s{index}]overlay=x='{x}':y='{y}':eof_action=pass:"
+                f"enable='between(t,{start:.3f},{start + duration:.3f})'[o{index}]"
+            )
+            last = f"o{index}"
+            n_overlays += 1
+
+        if not n_overlays:
+            raise Exception("No valid scene clips created.")
+
+        srt_path = None
+        graph_path = None
+        try:
+            if subtitle_segments:
+                segments = [s for s in subtitle_segments if 'start' in s and 'end' in s and 'text' in s]
+                fd, srt_path = tempfile.mkstemp(suffix=".srt", dir=os.path.dirname(output_path))
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    write_srt(segments, f)
+                # libass lays SRT out on a 384x288 script canvas; convert pixel sizes to it
+                font_size = 40 if w < 1000 else 50
+                style = {
+                    # libass matches a family name, not a font file
+                    "FontName": os.path.splitext(_subtitle_font())[0],
+                    "FontSize": f"{font_size * 288 / h:.1f}",
+                    "PrimaryColour": "&HFFFFFF&",
+                    "OutlineColour": "&H000000&",
+                    "BorderStyle": "1",
+                    "Outline": f"{2 * 288 / h:.2f}",
+                    "Shadow": "0",
+                    "Alignment": "2",
+                    "MarginV": "0",
+                    "MarginL": f"{int(25 * 384 / w)}",
+                    "MarginR": f"{int(25 * 384 / w)}"
+                }
+                style_str = ",".join(f"{k}={v}" for k, v in style.items())
+                srt_fwd = srt_path.replace("\\", "/").replace(":", "\\:")
+                filters.append(f"[{last}]subtitles='{srt_fwd}':force_style='{style_str}'[subs]")
+                last = "subs"
+            filters.append(f"[{last}]format=yuv420p[v]")
+
+            # The graph grows with the scene count; a script file keeps it off the command
+            # line (capped at 32,767 characters on Windows)
+            fd, graph_path = tempfile.mkstemp(suffix=".ffgraph", dir=os.path.dirname(output_path))
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(";\n".join(filters))
+
+            codec, preset, ffmpeg_params = get_encoder_settings()
+            cmd = [FFMPEG_BINARY, "-y", "-hide_banner", "-loglevel", "error", "-nostats", "-progress", "pipe:1"]
+            cmd += inputs
+            cmd += ["-filter_complex_script", graph_path, "-map", "[v]", "-map", "0:a"]
+            cmd += ["-c:v", codec, "-preset", preset] + (ffmpeg_params or [])
+            cmd += ["-c:a", "aac", "-r", str(OUTPUT_FPS), "-t", f"{audio_duration:.3f}", output_path]
+
+            print(f"\nRendering {n_overlays} scenes with ffmpeg ({codec}) to {output_path}...")
+            self._run_ffmpeg_with_progress(cmd, audio_duration, progress_callback)
+        finally:
+            for path in (srt_path, graph_path):
+                if path:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+        return output_path
+
+    def _run_ffmpeg_with_progress(self, cmd, total_duration, progress_callback=None):
+        """Runs ffmpeg, reporting -progress output like MyBarLogger and killing it on stop."""
+        with tempfile.TemporaryFile() as stderr_file:
+            process = subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=stderr_file,
+                stdin=subprocess.DEVNULL,
+                startupinfo=_hidden_startupinfo()
+            )
+            last_print = 0
+            try:
+                for raw_line in process.stdout:
+                    if self.stop_event.is_set():
+                        process.kill()
+                        raise Exception("Video generation stopped by user.")
+                    line = raw_line.decode('utf-8', 'replace').strip()
+                    if not line.startswith("out_time_us="):
+                        continue
+                    try:
+                        done = int(line.split("=", 1)[1]) / 1e6
+                    except ValueError:
+                        continue
+                    current_time = time.time()
+                    if current_time - last_print > 0.5:
+                        percentage = min(100.0, done / total_duration * 100) if total_duration else 0.0
+                        msg = f"ffmpeg: {percentage:.1f}% ({done:.1f}/{total_duration:.1f}s)"
+                        print(msg)
+                        if progress_callback:
+                            progress_callback(msg, percentage)
+                        last_print = current_time
+            finally:
+                process.stdout.close()
+                process.wait()
+
+            if process.returncode != 0:
+                stderr_file.seek(0)
+                error = stderr_file.read().decode('utf-8', 'replace').strip()
+                raise Exception(f"ffmpeg exited with {process.returncode}: {error[-2000:]}")
+
     def burn_subtitles(self, video_path, subtitle_path, output_path, style_options=None):
         """
         Burn subtitles into video using ffmpeg.
@@ -584,11 +1221,8 @@ class VideoService:
 
         print(f"Running FFmpeg command: {' '.join(cmd)}")
         
-        # Run construction of startup info to hide console window on Windows
-        startupinfo = None
-        if os.name == 'nt':
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        # Hide the console window on Windows
+        startupinfo = _hidden_startupinfo()
             
         process = subprocess.Popen(
             cmd,
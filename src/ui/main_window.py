@@ -1,13 +1,14 @@
 import customtkinter as ctk
 from tkinter import filedialog, messagebox
 import os
-import json
+import orjson
 from datetime import datetime
 import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from ..services.audio_service import get_tts_service, AudioExtractor
-from ..services.subtitle_service import SubtitleService
+from ..services.subtitle_service import get_subtitle_service
 from ..services.llm_service import LLMService
-from ..services.media_service import MediaService
+from ..services.media_service import get_media_service
 from ..services.video_service import VideoService
 from ..utils.async_utils import AsyncTaskManager
 from ..utils.subtitle_utils import optimize_subtitles_for_llm
@@ -155,9 +156,9 @@ class App(ctk.CTk):
              self.tts_service = get_tts_service("gemini")
         else:
              self.tts_service = get_tts_service("pollinations")
-        self.subtitle_service = SubtitleService()
+        self.subtitle_service = get_subtitle_service()
         self.llm_service = LLMService()
-        self.media_service = MediaService()
+        self.media_service = get_media_service()
         self.video_service = VideoService()
 
         # Data
@@ -706,8 +707,8 @@ class App(ctk.CTk):
 
         self.scenes = result.get('scenes', [])
         #save the scenes to a json file with current time and date
-        with open(os.path.join(Config.OUTPUT_DIR, "scenes_llm_" + datetime.now().strftime("%Y%m%d_%H%M%S") + ".json"), "w") as f:
-            json.dump(self.scenes, f)
+        with open(os.path.join(Config.OUTPUT_DIR, "scenes_llm_" + datetime.now().strftime("%Y%m%d_%H%M%S") + ".json"), "wb") as f:
+            f.write(orjson.dumps(self.scenes, option=orjson.OPT_SERIALIZE_NUMPY))
         # Initially, media_url/media_path is None
         for scene in self.scenes:
             scene['media_url'] = None
@@ -737,20 +738,24 @@ class App(ctk.CTk):
         return (1920, 1080, "landscape")
 
     def _fetch_all_media(self):
-        """Iterate scenes and fetch media, updating UI after each scene."""
-        for i, scene in enumerate(self.scenes):
-            self._fetch_single_scene_media(scene)
-            
-            # Update the corresponding widget's status (thread-safe via after)
-            if i < len(self.scene_widgets):
-                widget = self.scene_widgets[i]
-                # Use after(0) to schedule UI update on main thread
-                self.after(0, widget.update_status)
+        """Fetch media for all scenes concurrently, updating UI as each scene finishes."""
+        with ThreadPoolExecutor(max_workers=Config.MEDIA_FETCH_WORKERS) as executor:
+            futures = {
+                executor.submit(self._fetch_single_scene_media, scene): i
+                for i, scene in enumerate(self.scenes)
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                # Update the corresponding widget's status (thread-safe via after)
+                if i < len(self.scene_widgets):
+                    widget = self.scene_widgets[i]
+                    # Use after(0) to schedule UI update on main thread
+                    self.after(0, widget.update_status)
         
         return self.scenes
 
-    def _fetch_single_scene_media(self, scene):
-        """Fetch media for a single scene dict, modifying it in place."""
+    def _fetch_single_scene_media(self, scene, use_cache=True):
+        """Fetch media for a single scene dict, modifying it in place. use_cache=False regenerates cached images."""
         query = scene.get('visual_query')
         source = scene.get('media_source')
         
@@ -767,12 +772,19 @@ class App(ctk.CTk):
             elif source == 'duckduckgo':
                 media_url = self.media_service.search_ddg_images(query)
                 scene['media_url'] = media_url
+                if media_url:
+                    # Download the image now (in this fetch worker) instead of during
+                    # video assembly; the URL stays as a fallback if this fails
+                    try:
+                        scene['media_path'] = self.video_service.download_media(media_url, Config.OUTPUT_DIR, scene['id'])
+                    except Exception as e:
+                        print(f"DDG prefetch failed for scene {scene.get('id')}: {e}")
             elif source == 'pollinations':
                 prompt = scene.get('image_prompt', query)
                 filename = f"scene_{scene['id']}_{hash(prompt)}.jpg" # unique-ish name
                 path = os.path.join(Config.OUTPUT_DIR, filename)
                 # Pass dimensions
-                self.media_service.generate_image_pollinations(prompt, path, width, height)
+                self.media_service.generate_image_pollinations(prompt, path, width, height, use_cache=use_cache)
                 scene['media_path'] = path
         except Exception as e:
             print(f"Error fetching media for scene {scene.get('id')}: {e}")
@@ -814,7 +826,8 @@ class App(ctk.CTk):
         )
 
     def _fetch_single_scene_task(self, scene_data):
-        self._fetch_single_scene_media(scene_data)
+        # An explicit retry should produce a new image, not the cached one
+        self._fetch_single_scene_media(scene_data, use_cache=False)
         return scene_data
 
     def _on_single_retry_complete(self, result, error, widget):
@@ -972,8 +985,9 @@ class App(ctk.CTk):
             if not selected_sources:
                  selected_sources = ["pexels", "pollinations", "duckduckgo"]
                  
-            Config.ENABLED_MEDIA_SOURCES = selected_sources
             Config.save_key("ENABLED_MEDIA_SOURCES", ",".join(selected_sources))
+            # save_key stores the joined string in memory; keep the attribute a list
+            Config.ENABLED_MEDIA_SOURCES = selected_sources
 
         if hasattr(self, 'animation_var'):
             Config.IMAGE_ANIMATION_ENABLED = self.animation_var.get()
@@ -1,6 +1,7 @@
 import threading
 import queue
 import asyncio
+from concurrent.futures import Future
 
 class AsyncTaskManager:
     def __init__(self):
@@ -47,3 +48,36 @@ class AsyncTaskManager:
         self.is_running = False
         if self.worker_thread.is_alive():
             self.worker_thread.join()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key: the first caller runs the function,
+    callers arriving while it is still in flight wait for and share its result
+    (or exception). Nothing is cached once the call completes.
+    """
+    def __init__(self):
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = func(*args, **kwargs)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
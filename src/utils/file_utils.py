@@ -0,0 +1,43 @@
+import os
+import shutil
+
+def link_or_copy(src: str, dst: str):
+    """Hard-links src to dst (replacing dst), falling back to a copy across filesystems."""
+    if os.path.abspath(src) == os.path.abspath(dst):
+        return
+    try:
+        if os.path.exists(dst):
+            os.remove(dst)
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+def evict_lru(cache_dir: str, max_bytes: int, keep: str = None):
+    """
+    Removes least recently used files (oldest mtime first) from cache_dir until it
+    fits max_bytes. A file's .json sidecar goes with it; sidecars and .tmp files are
+    not counted. `keep` is never removed.
+    """
+    entries = []
+    total = 0
+    for entry in os.scandir(cache_dir):
+        if not entry.is_file() or entry.name.endswith(('.json', '.tmp')):
+            continue
+        st = entry.stat()
+        entries.append((st.st_mtime, st.st_size, entry.path))
+        total += st.st_size
+
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        try:
+            os.remove(os.path.splitext(path)[0] + ".json")
+        except OSError:
+            pass
@@ -0,0 +1,89 @@
+import random
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Transient statuses worth retrying at the transport level
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Longest Retry-After (seconds) the transport will sleep for before giving the response back
+MAX_RETRY_AFTER = 30
+
+class JitteredRetry(Retry):
+    """
+    urllib3 Retry whose exponential backoff is scaled by a random factor in [0.5, 1.5),
+    so concurrent clients hitting the same 429/5xx do not retry in lockstep.
+    Retry-After headers are honored up to MAX_RETRY_AFTER seconds.
+    """
+    def get_backoff_time(self):
+        return super().get_backoff_time() * random.uniform(0.5, 1.5)
+
+    def parse_retry_after(self, retry_after):
+        return min(super().parse_retry_after(retry_after), MAX_RETRY_AFTER)
+
+# (connect, read) seconds applied to requests made without an explicit timeout
+DEFAULT_TIMEOUT = (10, 120)
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that applies a default timeout, so no call can block forever on a dead socket."""
+    def __init__(self, *args, timeout=DEFAULT_TIMEOUT, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+def _mount(retry: Retry, pool_size: int, timeout) -> requests.Session:
+    adapter = TimeoutHTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry, timeout=timeout)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def create_session(pool_size: int = 16, total_retries: int = 3, backoff_factor: float = 1, timeout=DEFAULT_TIMEOUT) -> requests.Session:
+    """
+    Creates a requests.Session with a pooled keep-alive adapter, a default
+    (connect, read) timeout and automatic retries (jittered exponential backoff,
+    Retry-After aware) on connection errors and transient HTTP errors.
+    Only idempotent methods are retried after the request was sent.
+    """
+    retry = JitteredRetry(
+        total=total_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        raise_on_status=False  # Hand the final response back to the caller
+    )
+    return _mount(retry, pool_size, timeout)
+
+def create_post_session(pool_size: int = 16, connect_retries: int = 2, backoff_factor: float = 1, timeout=DEFAULT_TIMEOUT) -> requests.Session:
+    """
+    Creates a pooled session for paid/non-idempotent POSTs (LLM, TTS, transcription).
+    Only failed connections (request never sent) are retried; read timeouts and
+    429/5xx responses go straight back to the caller, whose own key rotation and
+    backoff decide what to do next.
+    """
+    retry = JitteredRetry(
+        total=connect_retries,
+        connect=connect_retries,
+        read=0,
+        status=0,
+        other=0,
+        backoff_factor=backoff_factor,
+        allowed_methods=None,
+        raise_on_status=False
+    )
+    return _mount(retry, pool_size, timeout)
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 8.0) -> float:
+    """
+    Returns a jittered exponential backoff delay (seconds) for a 0-based retry attempt:
+    min(cap, base * 2**attempt), scaled by a random factor in [0.5, 1.5).
+    """
+    return min(cap, base * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+# Shared sessions so all services reuse the same connection pools
+SESSION = create_session()
+POST_SESSION = create_post_session()
@@ -1,12 +1,12 @@
-from typing import List, Dict, Union, Any
+from typing import List, Dict, Union, Any, Iterator, TextIO
 
-def optimize_subtitles_for_llm(subtitles: List[Dict[str, Any]]) -> List[List[Union[str, int]]]:
+def optimize_subtitles_for_llm(subtitles: List[Dict[str, Any]]) -> List[List[Union[str, float]]]:
     """
     Optimizes subtitle data for LLM consumption by reducing token count.
     
     Converts a list of subtitle dictionaries with 'word', 'start', and 'end' keys
-    into a compact list of lists format: [[word, start_ms, end_ms], ...].
-    Timestamps are converted from seconds to milliseconds (integer).
+    into a compact list of lists format: [[word, start, end], ...].
+    Timestamps stay in seconds, rounded to 2 decimals (extra digits only cost tokens).
     
     Args:
         subtitles: A list of dictionaries, where each dictionary represents a word
@@ -15,7 +15,7 @@ def optimize_subtitles_for_llm(subtitles: List[Dict[str, Any]]) -> List[List[Uni
                    
     Returns:
         A list of lists, where each inner list contains:
-        [word (str), start_ms (int), end_ms (int)].
+        [word (str), start (float seconds), end (float seconds)].
     """
     optimized_subtitles = []
     
@@ -30,7 +30,8 @@ def optimize_subtitles_for_llm(subtitles: List[Dict[str, Any]]) -> List[List[Uni
             # start_ms = int(round(start_sec * 1000))
             # end_ms = int(round(end_sec * 1000))
             
-            optimized_subtitles.append([word, start_sec, end_sec])
+            # float() so numpy scalars (e.g. from WhisperX) stay JSON-serializable
+            optimized_subtitles.append([word, round(float(start_sec), 2), round(float(end_sec), 2)])
             
     return optimized_subtitles
 
@@ -45,17 +46,25 @@ def float_to_srt_time_format(d_seconds: float) -> str:
     seconds = seconds % 60
     return f"{hours:02d}:{minutes:02d}:{seconds:02d},{microseconds:03d}"
 
-def segments_to_srt(segments: List[Dict[str, Any]]) -> str:
-    """
-    Convert a list of segment dicts to SRT formatted string.
-    Each segment is expected to have 'start', 'end', and 'text'.
-    """
-    srt_content = ""
+def _srt_blocks(segments: List[Dict[str, Any]]) -> Iterator[str]:
+    """Yields one SRT cue block per segment."""
     for i, segment in enumerate(segments, start=1):
         start_time = float_to_srt_time_format(segment.get('start', 0))
         end_time = float_to_srt_time_format(segment.get('end', 0))
         text = segment.get('text', '').strip()
         
-        srt_content += f"{i}\n{start_time} --> {end_time}\n{text}\n\n"
-    
-    return srt_content
+        yield f"{i}\n{start_time} --> {end_time}\n{text}\n\n"
+
+def segments_to_srt(segments: List[Dict[str, Any]]) -> str:
+    """
+    Convert a list of segment dicts to SRT formatted string.
+    Each segment is expected to have 'start', 'end', and 'text'.
+    """
+    return "".join(_srt_blocks(segments))
+
+def write_srt(segments: List[Dict[str, Any]], fp: TextIO) -> None:
+    """
+    Write segments as SRT straight to an open text file, without building
+    the whole document in memory first.
+    """
+    fp.writelines(_srt_blocks(segments))
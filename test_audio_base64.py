@@ -0,0 +1,41 @@
+import os
+import sys
+import base64
+import tempfile
+
+# Add root to path
+sys.path.append(os.getcwd())
+
+from src.services.audio_service import PollinationsTTS
+
+def _decode_to_file(b64_data, slice_size=4 * 16384):
+    tts = PollinationsTTS()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = os.path.join(tmp_dir, "chunk.mp3")
+        written = tts._write_base64_to_file(b64_data, output_path, slice_size)
+        with open(output_path, 'rb') as f:
+            data = f.read()
+    assert written == len(data)
+    return data
+
+def test_newline_wrapped_payload():
+    print("Testing newline-wrapped base64 decode...")
+    payload = os.urandom(200 * 1024)
+    # encodebytes wraps every 76 characters, so slices no longer fall on 4-char groups
+    assert _decode_to_file(base64.encodebytes(payload).decode("ascii")) == payload
+    assert _decode_to_file(base64.encodebytes(payload).decode("ascii").replace("\n", "\r\n")) == payload
+    print("Success! Wrapped payload decoded intact.")
+
+def test_plain_payload():
+    print("Testing plain base64 decode...")
+    for size in (0, 1, 2, 3, 65535, 200 * 1024 + 1):
+        payload = os.urandom(size)
+        encoded = base64.b64encode(payload).decode("ascii")
+        assert _decode_to_file(encoded) == payload
+        # Odd slice sizes must not split a 4-character group either
+        assert _decode_to_file(encoded, slice_size=1001) == payload
+    print("Success! Plain payloads decoded intact.")
+
+if __name__ == "__main__":
+    test_newline_wrapped_payload()
+    test_plain_payload()
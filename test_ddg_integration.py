@@ -8,12 +8,12 @@ sys.path.append(os.getcwd())
 # Load env vars
 load_dotenv()
 
-from src.services.media_service import MediaService
+from src.services.media_service import get_media_service
 
 def test_ddg():
     print("Testing DuckDuckGo Image Search Integration...")
     
-    ms = MediaService()
+    ms = get_media_service()
     
     query = "beautiful sunset over ocean"
     print(f"Searching for: '{query}'")
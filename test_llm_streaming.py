@@ -0,0 +1,97 @@
+import os
+import sys
+import tempfile
+import orjson
+
+# Add root to path
+sys.path.append(os.getcwd())
+
+from src.config import Config
+from src.services.llm_service import LLMService
+
+# Keep plans out of the real cache and independent of the user's .env
+Config.LLM_CACHE_DIR = tempfile.mkdtemp()
+Config.ENABLED_MEDIA_SOURCES = ["pexels", "pollinations", "duckduckgo"]
+
+WORDS = [["Foxes", 0.0, 0.5], ["run", 0.5, 1.0], ["fast.", 1.0, 1.5],
+         ["Birds", 1.5, 2.0], ["fly", 2.0, 2.5], ["high.", 2.5, 3.0]]
+SCENES = [
+    {"id": 1, "text": "Foxes run fast.", "start_time": 0.0, "end_time": 1.5,
+     "media_source": "pexels", "visual_query": "red fox running"},
+    {"id": 2, "text": "Birds fly high.", "start_time": 1.5, "end_time": 3.0,
+     "media_source": "pexels", "visual_query": "birds flying sky"},
+]
+
+class FakeResponse:
+    def __init__(self, content_type, body=b"", lines=()):
+        self.status_code = 200
+        self.headers = {"Content-Type": content_type}
+        self.content = body
+        self._lines = lines
+
+    def iter_lines(self, decode_unicode=False):
+        return iter(self._lines)
+
+    def close(self):
+        pass
+
+class FakeSession:
+    def __init__(self, response):
+        self.response = response
+        self.payloads = []
+
+    def post(self, url, headers=None, json=None, timeout=None, stream=False):
+        self.payloads.append(json)
+        return self.response
+
+def _sse_response():
+    content = orjson.dumps({"scenes": SCENES}).decode()
+    # Split the reply mid-object so scenes complete across several deltas
+    pieces = [content[i:i + 25] for i in range(0, len(content), 25)]
+    lines = [f"data: {orjson.dumps({'choices': [{'delta': {'content': p}}]}).decode()}" for p in pieces]
+    return FakeResponse("text/event-stream", lines=lines + ["data: [DONE]"])
+
+def _json_response():
+    body = orjson.dumps({"choices": [{"message": {"content": orjson.dumps({"scenes": SCENES}).decode()}}]})
+    return FakeResponse("application/json", body=body)
+
+def _plan(response, on_scene, use_cache=False):
+    service = LLMService(session=FakeSession(response))
+    result = service.segment_script_and_generate_queries(
+        "Foxes run fast. Birds fly high.", WORDS, use_cache=use_cache, on_scene=on_scene
+    )
+    return service, result
+
+def test_streamed_reply_reports_scenes():
+    print("Testing on_scene with an SSE reply...")
+    seen = []
+    service, result = _plan(_sse_response(), seen.append)
+    assert service.session.payloads[0]["stream"] is True
+    assert [s["id"] for s in seen] == [1, 2]
+    assert len(result["scenes"]) == 2
+    print("Success! Streamed scenes reported.")
+
+def test_plain_json_reply_reports_scenes():
+    print("Testing on_scene when the provider ignores stream...")
+    seen = []
+    _, result = _plan(_json_response(), seen.append)
+    assert [s["id"] for s in seen] == [1, 2]
+    assert len(result["scenes"]) == 2
+    print("Success! Plain JSON scenes reported.")
+
+def test_failing_callback_does_not_abort():
+    print("Testing a failing on_scene callback...")
+    def broken(scene):
+        raise RuntimeError("boom")
+
+    _, fresh = _plan(_json_response(), broken)
+    assert len(fresh["scenes"]) == 2
+    # Served from the cache written by the request above
+    _, cached = _plan(_json_response(), broken, use_cache=True)
+    assert cached == fresh
+    print("Success! Plan returned despite callback errors.")
+
+if __name__ == "__main__":
+    test_streamed_reply_reports_scenes()
+    test_plain_json_reply_reports_scenes()
+    test_failing_callback_does_not_abort()